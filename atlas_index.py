@@ -0,0 +1,112 @@
+"""
+Item name -> atlas rectangle lookup tables.
+
+The JSON table maps each item to the page and rectangle of its first icon. The binary index holds the same data for
+clients that would rather not parse JSON: a header, fixed-width records sorted by the UTF-8 bytes of the item name,
+then a string table of the names. It can be memory-mapped and binary-searched in place; `AtlasIndex` does so.
+
+Header, little-endian:
+    8s  magic `SC2ATLAS`
+    I   version
+    I   number of records
+    I   offset of the records
+    I   offset of the string table
+    H   record size
+    H   tile size of the full-size pages, to scale rectangles for mip levels
+Record, little-endian:
+    I   offset of the name in the string table
+    H   length of the name in bytes
+    H   page
+    I   x
+    I   y
+    H   w
+    H   h
+"""
+
+from typing import *
+import json
+import mmap
+import os
+import struct
+
+INDEX_MAGIC = b'SC2ATLAS'
+INDEX_VERSION = 1
+HEADER = struct.Struct('<8sIIIIHH')
+RECORD = struct.Struct('<IHHIIHH')
+
+
+class AtlasRect(NamedTuple):
+    page: int
+    x: int
+    y: int
+    w: int
+    h: int
+
+
+def item_rects(icon_manifest: dict[str, list[str]], icon_rects: dict[str, dict[str, int]]) -> dict[str, AtlasRect]:
+    """item -> the rectangle of its first icon. `icon_rects` is the atlas metadata's 'icons', keyed by file name"""
+    result = {}
+    for item, icons in sorted(icon_manifest.items()):
+        if not icons or os.path.basename(icons[0]) not in icon_rects:
+            continue
+        rect = icon_rects[os.path.basename(icons[0])]
+        result[item] = AtlasRect(rect['page'], rect['x'], rect['y'], rect['w'], rect['h'])
+    return result
+
+
+def encode_index(rects: dict[str, AtlasRect], tile_size: int) -> bytes:
+    names = sorted(name.encode('utf-8') for name in rects)
+    records_offset = HEADER.size
+    strings_offset = records_offset + RECORD.size * len(names)
+    records = bytearray()
+    strings = bytearray()
+    for name in names:
+        rect = rects[name.decode('utf-8')]
+        records += RECORD.pack(len(strings), len(name), rect.page, rect.x, rect.y, rect.w, rect.h)
+        strings += name
+    header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(names), records_offset, strings_offset, RECORD.size, tile_size)
+    return header + records + strings
+
+
+def write_item_tables(json_path: str, index_path: str, rects: dict[str, AtlasRect], tile_size: int) -> None:
+    with open(json_path, 'w') as fp:
+        json.dump({item: rect._asdict() for item, rect in rects.items()}, fp, indent=1)
+    temp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as fp:
+        fp.write(encode_index(rects, tile_size))
+    os.replace(temp_path, index_path)
+
+
+class AtlasIndex:
+    """A memory-mapped binary atlas index"""
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as fp:
+            self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.records_offset, self.strings_offset, record_size, self.tile_size = HEADER.unpack_from(self.data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != RECORD.size:
+            raise ValueError(f'{path} is not a version {INDEX_VERSION} atlas index')
+
+    def name(self, index: int) -> bytes:
+        offset, length, *_ = RECORD.unpack_from(self.data, self.records_offset + index * RECORD.size)
+        start = self.strings_offset + offset
+        return self.data[start:start + length]
+
+    def lookup(self, item: str) -> AtlasRect | None:
+        key = item.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self.name(low) != key:
+            return None
+        _, _, *rect = RECORD.unpack_from(self.data, self.records_offset + low * RECORD.size)
+        return AtlasRect(*rect)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        self.data.close()
@@ -0,0 +1,450 @@
+"""
+Resolve every item at once by joining the relations of a ResolutionGraph as sparse boolean matrices.
+
+A ResolutionGraph is the compact, integer-keyed form of the maps joined by `parse_icon_data.resolve_item_icon`.
+Every unit, ability, button, upgrade, requirement and validator name is interned into one symbol table,
+and every icon into a separate icon table. Each relation between them is stored CSR-style:
+an offsets array indexed by source symbol and a flat targets array. One-to-one relations are plain arrays
+indexed by source symbol.
+
+Icon columns are numbered in sorted name order, so each item's icons come out sorted. With numpy installed, a matrix
+is a pair of row and column arrays sorted by row, and a boolean matrix product `left @ right` gathers the `right`
+rows for every entry of `left` with searchsorted and repeat; duplicate entries are only dropped from the final
+item -> icon matrix. Otherwise matrices over icons
+store each row as a Python int used as a packed bitset, relations between symbols stay as sparse column lists, and
+a product is an OR of whole `right` rows for each column in a `left` row.
+"""
+
+from typing import *
+from array import array
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is optional, only used to speed up the matrix products
+    np = None
+
+from override_matcher import OverrideMatcher, icon_stem
+from requirement_graph import iter_bits
+
+UNIT = 0
+UPGRADE = 1
+ABILITY = 2
+GALAXY_TYPES = {'unit': UNIT, 'upgrade': UPGRADE, 'ability': ABILITY}
+
+
+class Interner:
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.names: list[str] = list(dict.fromkeys(names))
+        self.ids: dict[str, int] = dict(zip(self.names, range(len(self.names))))
+
+    def intern(self, name: str) -> int:
+        result = self.ids.get(name)
+        if result is None:
+            result = len(self.names)
+            self.ids[name] = result
+            self.names.append(name)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+NONE = -1
+
+
+def csr(relation: Mapping[str, Collection[str]], ids: dict[str, int]) -> tuple[array, array]:
+    """
+    Offsets and targets arrays for a one-to-many relation; the targets of `i` are `targets[offsets[i]:offsets[i + 1]]`.
+    Every name must already be interned in `ids`.
+    """
+    sources = sorted(relation, key=ids.__getitem__)
+    counts = [0] * len(ids)
+    for source in sources:
+        counts[ids[source]] = len(relation[source])
+    offsets = array('i', [0])
+    offsets.extend(itertools.accumulate(counts))
+    targets = array('i', map(ids.__getitem__, itertools.chain.from_iterable(map(relation.__getitem__, sources))))
+    return offsets, targets
+
+
+def dense(relation: Mapping[str, str], ids: dict[str, int], target_ids: dict[str, int]) -> array:
+    """A one-to-one relation as an array indexed by source, holding NONE where there is no target"""
+    result = array('i', [NONE]) * len(ids)
+    for source, target in relation.items():
+        result[ids[source]] = target_ids[target]
+    return result
+
+
+class Unlock(NamedTuple):
+    galaxy_type: int
+    symbol: int
+    fallback: int
+    """For abilities, the symbol of the bare ability name used when the indexed command has no buttons"""
+
+
+class ResolutionGraph:
+    ONE_TO_MANY = (
+        'unit_to_ability', 'ability_to_button', 'requirement_to_button', 'requirement_to_ability', 'upgrade_to_requirement',
+    )
+    ONE_TO_ONE = ('requirement_to_validator',)
+    TO_ICON = ('button_to_icon', 'upgrade_to_icon', 'validator_to_icon')
+
+    def __init__(
+        self,
+        id_to_unlocks: Mapping[Hashable, list],
+        unit_to_ability: Mapping[str, Iterable[str]],
+        ability_to_button: Mapping[str, Iterable[str]],
+        button_to_icon: Mapping[str, str],
+        upgrade_to_icon: Mapping[str, str],
+        requirement_to_button: Mapping[str, Iterable[str]],
+        requirement_to_ability: Mapping[str, Iterable[str]],
+        upgrade_to_requirement: Mapping[str, Iterable[str]],
+        requirement_to_validator: Mapping[str, str],
+        validator_to_icon: Mapping[str, str],
+    ) -> None:
+        # Every name is interned up front, so the relations below are built with C-level lookups over whole maps
+        unlock_names: dict[Hashable, tuple[int, str, str]] = {}
+        for unlocks in id_to_unlocks.values():
+            for unlock in unlocks:
+                if unlock not in unlock_names:
+                    galaxy_type = GALAXY_TYPES[unlock.galaxy_type]
+                    if galaxy_type == ABILITY:
+                        unlock_names[unlock] = (galaxy_type, f'{unlock.name},{unlock.index}', unlock.name)
+                    else:
+                        unlock_names[unlock] = (galaxy_type, unlock.name, unlock.name)
+        one_to_many = {
+            'unit_to_ability': unit_to_ability,
+            'ability_to_button': ability_to_button,
+            'requirement_to_button': requirement_to_button,
+            'requirement_to_ability': requirement_to_ability,
+            'upgrade_to_requirement': upgrade_to_requirement,
+        }
+        # Only non-empty icons are ever used, and always lower-cased
+        to_icon = {
+            'button_to_icon': {key: value.lower() for key, value in button_to_icon.items() if value},
+            'upgrade_to_icon': {key: value.lower() for key, value in upgrade_to_icon.items() if value},
+            'validator_to_icon': {key: value.lower() for key, value in validator_to_icon.items() if value},
+        }
+        self.symbols = Interner(itertools.chain(
+            *one_to_many.values(),
+            *map(itertools.chain.from_iterable, (relation.values() for relation in one_to_many.values())),
+            requirement_to_validator,
+            requirement_to_validator.values(),
+            *to_icon.values(),
+            itertools.chain.from_iterable(names[1:] for names in unlock_names.values()),
+        ))
+        self.icons = Interner(itertools.chain.from_iterable(relation.values() for relation in to_icon.values()))
+        ids = self.symbols.ids
+
+        interned_unlocks = {
+            galaxy_item: Unlock(galaxy_type, ids[name], ids[fallback])
+            for galaxy_item, (galaxy_type, name, fallback) in unlock_names.items()
+        }
+        self.unlocks: dict[Hashable, tuple[Unlock, ...]] = {
+            item_id: tuple(map(interned_unlocks.__getitem__, unlocks)) for item_id, unlocks in id_to_unlocks.items()
+        }
+
+        self.unit_to_ability = csr(unit_to_ability, ids)
+        self.ability_to_button = csr(ability_to_button, ids)
+        self.requirement_to_button = csr(requirement_to_button, ids)
+        self.requirement_to_ability = csr(requirement_to_ability, ids)
+        self.upgrade_to_requirement = csr(upgrade_to_requirement, ids)
+        self.requirement_to_validator = dense(requirement_to_validator, ids, ids)
+        self.button_to_icon = dense(to_icon['button_to_icon'], ids, self.icons.ids)
+        self.upgrade_to_icon = dense(to_icon['upgrade_to_icon'], ids, self.icons.ids)
+        self.validator_to_icon = dense(to_icon['validator_to_icon'], ids, self.icons.ids)
+        self.icon_output = [icon.replace('&apos;', "'") for icon in self.icons.names]
+        self.icon_stems = [icon_stem(icon) for icon in self.icons.names]
+
+
+
+def build_resolution_graph(kwargs: dict[str, Any]) -> ResolutionGraph:
+    """The graph of the keyword arguments `parse_icon_data.resolve_item_icon` takes"""
+    return ResolutionGraph(**{key: value for key, value in kwargs.items() if key not in ('item_numbers', 'overrides')})
+
+
+SparseRows = dict[int, Sequence[int]]
+"""row -> columns; all-false rows are omitted"""
+BitRows = dict[int, int]
+"""row -> bitset of columns; all-false rows are omitted"""
+
+
+def csr_rows(relation: tuple[array, array], sources: Iterable[int]) -> SparseRows:
+    """The rows of a one-to-many relation for `sources`"""
+    offsets, targets = relation
+    return {
+        source: targets[offsets[source]:offsets[source + 1]]
+        for source in sources
+        if offsets[source] != offsets[source + 1]
+    }
+
+
+def dense_bits(relation: array, sources: Iterable[int], column_map: Sequence[int]) -> BitRows:
+    """The rows of a one-to-one relation onto icons for `sources`, as bitsets"""
+    result = {}
+    for source in sources:
+        target = relation[source]
+        if target != NONE:
+            result[source] = 1 << column_map[target]
+    return result
+
+
+def columns(rows: SparseRows) -> set[int]:
+    result = set()
+    for row in rows.values():
+        result.update(row)
+    return result
+
+
+def join(left: SparseRows, right: BitRows) -> BitRows:
+    """The boolean matrix product `left @ right`"""
+    result = {}
+    for row, columns in left.items():
+        bits = 0
+        for column in columns:
+            bits |= right.get(column, 0)
+        if bits:
+            result[row] = bits
+    return result
+
+
+def union(*matrices: BitRows) -> BitRows:
+    result = dict(matrices[0])
+    for matrix in matrices[1:]:
+        for row, bits in matrix.items():
+            result[row] = result.get(row, 0) | bits
+    return result
+
+
+Pairs = tuple['np.ndarray', 'np.ndarray']
+"""(rows, columns) of the true entries of a boolean matrix, sorted by row"""
+
+
+def csr_pairs(relation: tuple[array, array]) -> Pairs:
+    offsets, targets = relation
+    offsets = np.frombuffer(offsets, dtype=np.int32)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)), np.frombuffer(targets, dtype=np.int32)
+
+
+def dense_pairs(relation: array, column_map: 'np.ndarray | None' = None) -> Pairs:
+    targets = np.frombuffer(relation, dtype=np.int32)
+    rows = np.flatnonzero(targets != NONE)
+    columns = targets[rows]
+    return rows, column_map[columns] if column_map is not None else columns
+
+
+def unique_pairs(matrix: Pairs, num_columns: int) -> Pairs:
+    """Drops duplicate entries, and sorts each row's columns"""
+    keys = np.unique(matrix[0].astype(np.int64) * num_columns + matrix[1])
+    return keys // num_columns, keys % num_columns
+
+
+def product(left: Pairs, right: Pairs) -> Pairs:
+    """
+    The boolean matrix product `left @ right`. Entries may be repeated, which is harmless for later products; rows
+    stay sorted if `left`'s are
+    """
+    left_rows, left_columns = left
+    right_rows, right_columns = right
+    starts = np.searchsorted(right_rows, left_columns, 'left')
+    counts = np.searchsorted(right_rows, left_columns, 'right') - starts
+    # For every entry of left, the positions of the right row it selects
+    positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    return np.repeat(left_rows, counts), right_columns[positions]
+
+
+def union_pairs(*matrices: Pairs) -> Pairs:
+    rows = np.concatenate([rows for rows, _ in matrices])
+    order = np.argsort(rows, kind='stable')
+    return rows[order], np.concatenate([columns for _, columns in matrices])[order]
+
+
+class BatchResolver:
+    """
+    Computes item -> icon for the whole catalogue with a handful of matrix products; gives the same results
+    as `parse_icon_data.resolve_item_icon` for every item. Overrides are applied afterwards.
+    """
+    def __init__(self, graph: ResolutionGraph, item_numbers: Mapping[str, Hashable], overrides: OverrideMatcher) -> None:
+        self.graph = graph
+        self.item_numbers = item_numbers
+        self.overrides = overrides
+        self.icon_by_rank = sorted(range(len(graph.icons)), key=graph.icons.names.__getitem__)
+        # The inverse permutation, sorted at C speed
+        self.rank_of_icon = sorted(range(len(graph.icons)), key=self.icon_by_rank.__getitem__)
+        self.output_by_rank = [graph.icon_output[icon] for icon in self.icon_by_rank]
+        self.stem_by_rank = [graph.icon_stems[icon] for icon in self.icon_by_rank]
+        self.ranks_by_stem: dict[str, list[int]] | None = None
+        self.remove_masks: dict[frozenset[str], int] = {}
+
+    def unlock_icon_matrices(self, units: Iterable[int], upgrades: Iterable[int], abilities: Iterable[int]) -> dict[int, BitRows]:
+        """
+        symbol -> icon matrices for each kind of galaxy unlock. Only the rows for the given unlock symbols are
+        computed, and each intermediate relation is restricted to the rows the next join needs.
+        """
+        graph = self.graph
+        upgrades = set(upgrades)
+        unit_to_ability = csr_rows(graph.unit_to_ability, units)
+        upgrade_to_requirement = csr_rows(graph.upgrade_to_requirement, upgrades)
+        requirements = columns(upgrade_to_requirement)
+        requirement_to_button = csr_rows(graph.requirement_to_button, requirements)
+        requirement_to_ability = csr_rows(graph.requirement_to_ability, requirements)
+        requirement_to_validator = {
+            requirement: (graph.requirement_to_validator[requirement],)
+            for requirement in requirements
+            if graph.requirement_to_validator[requirement] != NONE
+        }
+        ability_to_button = csr_rows(
+            graph.ability_to_button, columns(unit_to_ability) | columns(requirement_to_ability) | set(abilities)
+        )
+        button_to_icon = dense_bits(
+            graph.button_to_icon, columns(ability_to_button) | columns(requirement_to_button) | upgrades, self.rank_of_icon
+        )
+        ability_to_icon = join(ability_to_button, button_to_icon)
+        requirement_to_icon = union(
+            join(requirement_to_validator, dense_bits(graph.validator_to_icon, columns(requirement_to_validator), self.rank_of_icon)),
+            join(requirement_to_button, button_to_icon),
+            join(requirement_to_ability, ability_to_icon),
+        )
+        upgrade_to_icon = union(
+            dense_bits(graph.upgrade_to_icon, upgrades, self.rank_of_icon),
+            # A button may direct-link to an upgrade
+            {upgrade: button_to_icon[upgrade] for upgrade in upgrades if upgrade in button_to_icon},
+            join(upgrade_to_requirement, requirement_to_icon),
+        )
+        return {
+            UNIT: join(unit_to_ability, ability_to_icon),
+            UPGRADE: upgrade_to_icon,
+            ABILITY: ability_to_icon,
+        }
+
+    def item_unlock_matrices(self, item_names: Sequence[str]) -> dict[int, SparseRows]:
+        """item -> symbol matrices for each kind of galaxy unlock, with rows numbered by position in `item_names`"""
+        graph = self.graph
+        rows: dict[int, dict[int, list[int]]] = {UNIT: {}, UPGRADE: {}, ABILITY: {}}
+        ability_offsets = graph.ability_to_button[0]
+        for row, item_name in enumerate(item_names):
+            for unlock in graph.unlocks.get(self.item_numbers[item_name], ()):
+                symbol = unlock.symbol
+                if unlock.galaxy_type == ABILITY and ability_offsets[symbol] == ability_offsets[symbol + 1]:
+                    symbol = unlock.fallback
+                    print(f'Backup: {graph.symbols.names[symbol]}')
+                rows[unlock.galaxy_type].setdefault(row, []).append(symbol)
+        return rows
+
+    def item_unlock_pairs(self, item_names: Sequence[str]) -> dict[int, Pairs]:
+        """`item_unlock_matrices` as Pairs, gathered with one pass over the items"""
+        graph = self.graph
+        item_unlocks = [graph.unlocks.get(self.item_numbers[item_name], ()) for item_name in item_names]
+        rows = np.repeat(np.arange(len(item_unlocks)), [len(unlocks) for unlocks in item_unlocks])
+        unlocks = np.fromiter(
+            itertools.chain.from_iterable(itertools.chain.from_iterable(item_unlocks)), dtype=np.int64
+        ).reshape(-1, 3)
+        kinds, symbols, fallbacks = unlocks[:, 0], unlocks[:, 1], unlocks[:, 2]
+        ability_offsets = np.frombuffer(graph.ability_to_button[0], dtype=np.int32)
+        backup = (kinds == ABILITY) & (ability_offsets[symbols] == ability_offsets[symbols + 1])
+        for symbol in fallbacks[backup].tolist():
+            print(f'Backup: {graph.symbols.names[symbol]}')
+        symbols = np.where(backup, fallbacks, symbols)
+        return {kind: (rows[kinds == kind], symbols[kinds == kind]) for kind in (UNIT, UPGRADE, ABILITY)}
+
+    def unlock_icon_pairs(self) -> dict[int, Pairs]:
+        """symbol -> icon matrices for each kind of galaxy unlock, over every symbol in the graph"""
+        graph = self.graph
+        rank_of_icon = np.array(self.rank_of_icon, dtype=np.int64)
+        button_to_icon = dense_pairs(graph.button_to_icon, rank_of_icon)
+        ability_to_icon = product(csr_pairs(graph.ability_to_button), button_to_icon)
+        requirement_to_icon = union_pairs(
+            product(dense_pairs(graph.requirement_to_validator), dense_pairs(graph.validator_to_icon, rank_of_icon)),
+            product(csr_pairs(graph.requirement_to_button), button_to_icon),
+            product(csr_pairs(graph.requirement_to_ability), ability_to_icon),
+        )
+        upgrade_to_icon = union_pairs(
+            dense_pairs(graph.upgrade_to_icon, rank_of_icon),
+            # A button may direct-link to an upgrade
+            button_to_icon,
+            product(csr_pairs(graph.upgrade_to_requirement), requirement_to_icon),
+        )
+        return {
+            UNIT: product(csr_pairs(graph.unit_to_ability), ability_to_icon),
+            UPGRADE: upgrade_to_icon,
+            ABILITY: ability_to_icon,
+        }
+
+    def resolve_all(self, item_names: Iterable[str]) -> dict[str, list[str]]:
+        names = list(item_names)
+        if np is not None:
+            return self.resolve_all_numpy(names)
+        graph = self.graph
+        item_unlocks = self.item_unlock_matrices(names)
+        unlock_icons = self.unlock_icon_matrices(*(columns(item_unlocks[kind]) for kind in (UNIT, UPGRADE, ABILITY)))
+        item_icons = union(*(join(matrix, unlock_icons[kind]) for kind, matrix in item_unlocks.items()))
+
+        result: dict[str, list[str]] = {}
+        for row, item_name in enumerate(names):
+            item_overrides = self.overrides[item_name]
+            if item_overrides.set is not None:
+                result[item_name] = list(item_overrides.set)
+                continue
+            bits = item_icons.get(row, 0) & ~self.remove_mask(item_overrides.remove)
+            if not item_overrides.add:
+                result[item_name] = [graph.icon_output[self.icon_by_rank[rank]] for rank in iter_bits(bits)]
+                continue
+            icons = item_overrides.add.union(graph.icons.names[self.icon_by_rank[rank]] for rank in iter_bits(bits))
+            result[item_name] = [
+                x.replace('&apos;', "'")
+                for x in sorted(icons)
+                if icon_stem(x) not in item_overrides.remove
+            ]
+        return result
+
+    def resolve_all_numpy(self, names: list[str]) -> dict[str, list[str]]:
+        graph = self.graph
+        item_unlocks = self.item_unlock_pairs(names)
+        unlock_icons = self.unlock_icon_pairs()
+        item_rows, item_ranks = unique_pairs(
+            union_pairs(*(product(matrix, unlock_icons[kind]) for kind, matrix in item_unlocks.items())), len(graph.icons)
+        )
+        bounds = np.searchsorted(item_rows, np.arange(len(names) + 1)).tolist()
+        ranks = item_ranks.tolist()
+        outputs = list(map(self.output_by_rank.__getitem__, ranks))
+
+        result: dict[str, list[str]] = {}
+        for row, item_name in enumerate(names):
+            item_overrides = self.overrides[item_name]
+            if item_overrides.set is not None:
+                result[item_name] = list(item_overrides.set)
+                continue
+            start, end = bounds[row], bounds[row + 1]
+            if not item_overrides.add and not item_overrides.remove:
+                result[item_name] = outputs[start:end]
+                continue
+            icon_ranks = ranks[start:end]
+            if not item_overrides.add:
+                result[item_name] = [
+                    self.output_by_rank[rank] for rank in icon_ranks if self.stem_by_rank[rank] not in item_overrides.remove
+                ]
+                continue
+            icons = item_overrides.add.union(graph.icons.names[self.icon_by_rank[rank]] for rank in icon_ranks)
+            result[item_name] = [
+                x.replace('&apos;', "'")
+                for x in sorted(icons)
+                if icon_stem(x) not in item_overrides.remove
+            ]
+        return result
+
+    def remove_mask(self, stems: frozenset[str]) -> int:
+        """Bitset of the icon columns whose filename stem is in `stems`"""
+        result = self.remove_masks.get(stems)
+        if result is None:
+            if self.ranks_by_stem is None:
+                self.ranks_by_stem = {}
+                for rank, stem in enumerate(self.stem_by_rank):
+                    self.ranks_by_stem.setdefault(stem, []).append(rank)
+            result = 0
+            for stem in stems:
+                for rank in self.ranks_by_stem.get(stem, ()):
+                    result |= 1 << rank
+            self.remove_masks[stems] = result
+        return result
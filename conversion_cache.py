@@ -0,0 +1,168 @@
+"""
+Content-addressed cache of converted icons.
+
+Each output is keyed by the sha256 of its source .dds and the conversion settings. Encoded PNGs are kept
+under `build/cache/icons/` by key, so an icon is only re-encoded when its source or the converter changes,
+even after `icons/` is cleaned. `data/conversion_manifest.json` records the source, source hash and output
+hash of every converted icon for auditing. Sources are recorded relative to the workspace's source roots
+(see `source_roots`), so the manifest is the same on every machine.
+"""
+
+from typing import *
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_DIR = 'build/cache/icons'
+CONVERSION_SETTINGS = 'dds_reader+png_codec v1, zlib level 9, no date/time chunks'
+"""Change when conversion output changes, so every cached icon is re-encoded"""
+MOD_ASSETS_DIR = 'Mods/ArchipelagoPlayer.SC2Mod/Base.SC2Assets'
+
+
+def source_roots(workspace: Mapping[str, str]) -> dict[str, str]:
+    """root name -> directory holding the .dds sources, from the workspace config"""
+    return {'dds_files': workspace['dds_files'], 'mod_assets': f'{workspace["mod_files"]}/{MOD_ASSETS_DIR}'}
+
+
+def relative_source(source_path: str, roots: Mapping[str, str]) -> str:
+    """`source_path` as `<root name>/<path under the root>`, or unchanged if it is under none of `roots`"""
+    absolute_path = os.path.abspath(source_path)
+    for name, root in roots.items():
+        relative_path = os.path.relpath(absolute_path, os.path.abspath(root))
+        if not relative_path.startswith(os.pardir) and not os.path.isabs(relative_path):
+            return f'{name}/{relative_path}'.replace('\\', '/')
+    return source_path
+
+
+def absolute_source(source: str, roots: Mapping[str, str]) -> str:
+    """The path on this machine of a source recorded by `relative_source`"""
+    name, _, relative_path = source.partition('/')
+    if name in roots and relative_path:
+        return os.path.join(roots[name], relative_path)
+    return source
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        while chunk := fp.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OutputRecord(NamedTuple):
+    source: str
+    """relative to a source root; see `relative_source`"""
+    source_hash: str
+    key: str
+    output_hash: str
+
+
+class ConversionCache:
+    """
+    Source paths passed in are absolute or relative to the working directory; they are recorded relative to
+    `roots` (see `source_roots`). Without `roots`, recorded sources are kept as they are.
+    """
+    def __init__(
+        self, manifest_path: str, roots: Mapping[str, str] | None = None,
+        cache_dir: str = CACHE_DIR, settings: str = CONVERSION_SETTINGS,
+    ) -> None:
+        self.manifest_path = manifest_path
+        self.roots = roots if roots is not None else {}
+        self.cache_dir = cache_dir
+        self.settings = settings
+        self.records: dict[str, OutputRecord] = {}
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as fp:
+                manifest = json.load(fp)
+            if manifest.get('settings') == settings:
+                for target, record in manifest['outputs'].items():
+                    record = OutputRecord(**record)
+                    # Manifests written before sources were relative hold this machine's paths
+                    if record.source.partition('/')[0] not in self.roots:
+                        record = record._replace(source=self.relative_source(record.source))
+                    self.records[target] = record
+
+    def relative_source(self, source_path: str) -> str:
+        return relative_source(source_path, self.roots)
+
+    def key(self, source_hash: str) -> str:
+        return hashlib.sha256(f'{self.settings}\0{source_hash}'.encode('utf-8')).hexdigest()
+
+    def blob_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.png')
+
+    def is_current(self, target_path: str, key: str) -> bool:
+        """Whether `target_path` holds the output for `key`, unmodified since it was written"""
+        record = self.records.get(target_path)
+        return (
+            record is not None
+            and record.key == key
+            and os.path.isfile(target_path)
+            and hash_file(target_path) == record.output_hash
+        )
+
+    def restore(self, target_path: str, source_path: str, source_hash: str, key: str) -> bool:
+        """Copies a cached output for `key` to `target_path`, if there is one"""
+        blob_path = self.blob_path(key)
+        if not os.path.isfile(blob_path):
+            return False
+        temp_path = f'{target_path}.{os.getpid()}.tmp'
+        shutil.copyfile(blob_path, temp_path)
+        os.replace(temp_path, target_path)
+        self.records[target_path] = OutputRecord(self.relative_source(source_path), source_hash, key, hash_file(target_path))
+        return True
+
+    def adopt(self, target_path: str, source_path: str, source_hash: str, key: str) -> None:
+        """Records an existing output as current without caching it, e.g. one converted before this cache existed"""
+        self.records[target_path] = OutputRecord(self.relative_source(source_path), source_hash, key, hash_file(target_path))
+
+    def store(self, target_path: str, source_path: str, source_hash: str, key: str) -> None:
+        """Records a freshly converted `target_path` and keeps a copy of it under its key"""
+        blob_path = self.blob_path(key)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        temp_path = f'{blob_path}.{os.getpid()}.tmp'
+        shutil.copyfile(target_path, temp_path)
+        os.replace(temp_path, blob_path)
+        self.records[target_path] = OutputRecord(self.relative_source(source_path), source_hash, key, hash_file(target_path))
+
+    def update_output(self, target_path: str) -> None:
+        """Replaces the cached output of an already recorded `target_path` with the file as it is now"""
+        record = self.records.get(target_path)
+        if record is not None:
+            self.store(target_path, absolute_source(record.source, self.roots), record.source_hash, record.key)
+
+    def evict(self, current_targets: Container[str]) -> list[str]:
+        """
+        Deletes outputs that no current conversion produces, e.g. of items dropped from the icon manifest or whose
+        source no longer exists, then cached blobs that no output refers to. Returns the deleted output paths.
+        """
+        evicted = []
+        for target_path in list(self.records):
+            if target_path in current_targets:
+                continue
+            if os.path.isfile(target_path):
+                os.unlink(target_path)
+            del self.records[target_path]
+            evicted.append(target_path)
+        if os.path.isdir(self.cache_dir):
+            live_keys = {record.key for record in self.records.values()}
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.png') and entry.name[:-len('.png')] not in live_keys:
+                        os.unlink(entry.path)
+        return evicted
+
+    def save(self) -> None:
+        manifest = {
+            'settings': self.settings,
+            'outputs': {target: record._asdict() for target, record in sorted(self.records.items())},
+        }
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        temp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as fp:
+            json.dump(manifest, fp, indent=1)
+        os.replace(temp_path, self.manifest_path)
@@ -1,20 +1,148 @@
 """
-Convert .dds icons to .png under the `icons/` folder using magick.
+Convert .dds icons to .png under the `icons/` folder.
+
+Icons are decoded and encoded in-process by `dds_reader` and `png_codec`, spread over a process pool.
+Textures in formats the decoder doesn't handle fall back to magick.
+Only icons whose source or the conversion settings changed are re-encoded; see `conversion_cache`.
+Outputs `dedupe_icons` pruned as duplicates stay pruned while their source is unchanged, and the manifest points
+at their canonical file instead.
 """
 
 from typing import *
+import concurrent.futures
+import glob
+import itertools
 import json
-from pathlib import Path
 import os
+import shutil
 import subprocess
 
+from conversion_cache import ConversionCache, hash_file, source_roots
+from dds_reader import read_dds, DDSFormatError
 from filepaths import Paths
+from png_codec import write_png
+from source_index import SourceIndex
 
 ORIGINAL_DIR = 'icons/original'
 BLIZZARD_DIR = 'icons/blizzard'
+MAGICK_CONVERT = 'convert'
+MAX_PENDING_PER_WORKER = 4
+"""Bounds the conversions queued ahead of the pool, so memory stays flat however many icons there are"""
+
+
+class Conversion(NamedTuple):
+    source_path: str
+    target_path: str
+
+
+def convert_icon(source_path: str, target_path: str) -> str | None:
+    """Converts one .dds file to .png, returning an error message on failure"""
+    try:
+        image = read_dds(source_path)
+    except DDSFormatError as ex:
+        return convert_with_magick(source_path, target_path, str(ex))
+    except OSError as ex:
+        return f'could not read {source_path}: {ex}'
+    except Exception as ex:
+        # A malformed header can fail the decoder with any error; magick may still read the file
+        return convert_with_magick(source_path, target_path, f'{type(ex).__name__}: {ex}')
+    write_png(target_path, image)
+    return None
+
 
+def convert_with_magick(source_path: str, target_path: str, reason: str) -> str | None:
+    if not shutil.which(MAGICK_CONVERT):
+        return f'cannot decode {source_path} ({reason}) and {MAGICK_CONVERT} is not on the path'
+    retval = subprocess.call([MAGICK_CONVERT, source_path, '-define', 'png:exclude-chunk=date,time', target_path])
+    if retval:
+        return f'magick returned non-zero value {retval} trying to convert {source_path}'
+    return None
 
-def main(paths: Paths, fast: bool = True) -> None:
+
+def load_aliases(icon_aliases: str) -> dict[str, str]:
+    """duplicate path -> canonical path, as written by `dedupe_icons`"""
+    if not os.path.isfile(icon_aliases):
+        return {}
+    with open(icon_aliases, 'r') as fp:
+        return json.load(fp)
+
+
+def other_manifests(icon_manifest: str) -> list[str]:
+    """Every other icon manifest next to `icon_manifest`, e.g. the stable one next to beta"""
+    pattern = os.path.join(os.path.dirname(icon_manifest), '*icon_manifest.json')
+    return sorted(path for path in glob.glob(pattern) if not os.path.samefile(path, icon_manifest))
+
+
+def referenced_icons(manifest_paths: Iterable[str]) -> set[str]:
+    result = set()
+    for manifest_path in manifest_paths:
+        if not os.path.isfile(manifest_path):
+            continue
+        with open(manifest_path, 'r') as fp:
+            for item_icons in json.load(fp).values():
+                result.update(item_icons)
+    return result
+
+
+def conversion_error(conversion: Conversion, exception: BaseException) -> str:
+    return f'{type(exception).__name__}: {exception} trying to convert {conversion.source_path}'
+
+
+def run_conversions(conversions: Iterable[Conversion], workers: int = 1) -> Iterator[tuple[Conversion, str | None]]:
+    """
+    Yields each conversion with its error message, or None on success, in completion order.
+    At most `workers * MAX_PENDING_PER_WORKER` conversions are submitted to the pool at a time.
+    A conversion that raises is reported like any other failure, with or without the pool.
+    """
+    if workers <= 1:
+        for conversion in conversions:
+            try:
+                error = convert_icon(*conversion)
+            except Exception as ex:
+                error = conversion_error(conversion, ex)
+            yield conversion, error
+        return
+    remaining = iter(conversions)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = {
+            executor.submit(convert_icon, *conversion): conversion
+            for conversion in itertools.islice(remaining, workers * MAX_PENDING_PER_WORKER)
+        }
+        while in_flight:
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                conversion = in_flight.pop(future)
+                for next_conversion in itertools.islice(remaining, 1):
+                    in_flight[executor.submit(convert_icon, *next_conversion)] = next_conversion
+                exception = future.exception()
+                if exception is not None:
+                    yield conversion, conversion_error(conversion, exception)
+                else:
+                    yield conversion, future.result()
+
+
+def is_pruned(cache: ConversionCache, aliases: dict[str, str], target_path: str, key: str) -> bool:
+    """
+    Whether `target_path` was deleted by `dedupe_icons` as a duplicate and doesn't need converting again:
+    its canonical file still exists and its source is the one it was converted from
+    """
+    record = cache.records.get(target_path)
+    return (
+        target_path in aliases
+        and not os.path.isfile(target_path)
+        and os.path.isfile(aliases[target_path])
+        and record is not None
+        and record.key == key
+    )
+
+
+def main(paths: Paths, fast: bool = True, workers: int | None = None) -> None:
+    """
+    Converts every icon in the item locations and writes the icon manifest. Outputs are checked against the
+    conversion cache; with `fast`, existing outputs the cache doesn't know about yet are trusted as they are.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
     verbose = False
     extras = {
         '_terran': ['ui_glues_help_armyicon_terran.dds'],
@@ -25,11 +153,15 @@ def main(paths: Paths, fast: bool = True) -> None:
         config: dict[str, str] = json.load(fp)
     with open(paths.icon_paths, 'r') as fp:
         location_info: dict[str, dict] = json.load(fp)
-    dds_dir = config['dds_files']
-    mod_dir = config['mod_files']
+    roots = source_roots(config)
+    dds_dir = roots['dds_files']
+    assets_dir = roots['mod_assets']
+    dds_index = SourceIndex(dds_dir, paths.parse_cache)
+    assets_index = SourceIndex(assets_dir, paths.parse_cache)
+    collisions = len(dds_index.collisions) + len(assets_index.collisions)
+    print(f'Source index: {len(dds_index) + len(assets_index)} file(s), {collisions} case collision(s), rescanned {int(dds_index.rescanned) + int(assets_index.rescanned)} tree(s)')
 
     failures = 0
-    successes = 0
     skipped = 0
     no_information = 0
     parsed_locations: dict[str, list[str]] = location_info['locations']
@@ -42,10 +174,11 @@ def main(paths: Paths, fast: bool = True) -> None:
         os.makedirs(ORIGINAL_DIR)
     if not os.path.exists(BLIZZARD_DIR):
         os.makedirs(BLIZZARD_DIR)
-    converted: set[str] = set()
-    for item_number, item in enumerate(items):
-        if item_number % 50 == 0:
-            print(f'{item_number} / {len(items)}')
+    # Plan every conversion first, in item order, then run the unique ones in parallel
+    planned: list[tuple[str, str, bool]] = []
+    """(item, target path, whether this is the target's first conversion)"""
+    conversions: dict[str, Conversion] = {}
+    for item in items:
         locations = parsed_locations[item]
         if not locations:
             no_information += 1
@@ -55,33 +188,79 @@ def main(paths: Paths, fast: bool = True) -> None:
         for location, filename, stem in zip(locations, filenames, stems):
             if location.lower().startswith('ap'):
                 target_dir = ORIGINAL_DIR
-                assets_dir = f'{mod_dir}/Mods/ArchipelagoPlayer.SC2Mod/Base.SC2Assets'
                 source_path = f'{assets_dir}/{location}'
-                source_cased_path = list(Path(assets_dir).glob(location, case_sensitive=False))
+                source_cased_path = assets_index.matches(location)
             else:
                 target_dir = BLIZZARD_DIR
                 source_path = os.path.join(dds_dir, filename)
-                source_cased_path = list(Path(dds_dir).glob(filename, case_sensitive=False))
+                source_cased_path = dds_index.matches(filename)
             if not source_cased_path:
                 print(f'Failure: {source_path} does not exist')
                 failures += 1
                 continue
+            if len(source_cased_path) > 1:
+                print(f'Ambiguous: {source_path} matches {", ".join(source_cased_path)}; using the first')
             target_path = f'{target_dir}/{stem}.png'
-            if target_path in converted or (fast and os.path.isfile(target_path)):
-                skipped += 1
+            if target_path in conversions:
+                planned.append((item, target_path, False))
                 if verbose: print(f'Skipping {target_path} as it is already converted')
             else:
-                retval = subprocess.call(f'convert "{source_cased_path[0]}" -define png:exclude-chunk=date,time {target_path}', shell=True)
-                if retval:
-                    failures += 1
-                    print(f'magick returned non-zero value {retval} trying to convert {source_path}')
-                    continue
-                successes += 1
-                converted.add(target_path)
-            info.setdefault(item, []).append(target_path)
+                planned.append((item, target_path, True))
+                conversions[target_path] = Conversion(str(source_cased_path[0]), target_path)
+
+    cache = ConversionCache(paths.conversion_manifest, roots)
+    aliases = load_aliases(paths.icon_aliases)
+    keys: dict[str, tuple[str, str]] = {}
+    """target path -> (source hash, cache key)"""
+    pending: list[Conversion] = []
+    cached = 0
+    pruned: dict[str, str] = {}
+    """target path -> canonical path, for outputs dedupe pruned whose source is unchanged"""
+    for conversion in conversions.values():
+        source_hash = hash_file(conversion.source_path)
+        key = cache.key(source_hash)
+        keys[conversion.target_path] = (source_hash, key)
+        if cache.is_current(conversion.target_path, key):
+            cached += 1
+        elif is_pruned(cache, aliases, conversion.target_path, key):
+            pruned[conversion.target_path] = aliases[conversion.target_path]
+        elif fast and os.path.isfile(conversion.target_path) and conversion.target_path not in cache.records:
+            cache.adopt(conversion.target_path, conversion.source_path, source_hash, key)
+            cached += 1
+        elif cache.restore(conversion.target_path, conversion.source_path, source_hash, key):
+            cached += 1
+        else:
+            pending.append(conversion)
+
+    errors: dict[str, str] = {}
+    for index, (conversion, error) in enumerate(run_conversions(pending, workers), start=1):
+        if error is not None:
+            errors[conversion.target_path] = error
+            print(error)
+        else:
+            cache.store(conversion.target_path, conversion.source_path, *keys[conversion.target_path])
+        if index % 50 == 0:
+            print(f'{index} / {len(pending)}')
+    successes = len(pending) - len(errors)
+    # Outputs other builds' manifests still use are kept; they share the conversion manifest and `icons/`
+    if os.path.isfile(paths.icon_manifest):
+        other_icons = referenced_icons(other_manifests(paths.icon_manifest))
+    else:
+        other_icons = set()
+    evicted = cache.evict(conversions.keys() | other_icons)
+    for target_path in evicted:
+        print(f'Evicted {target_path}: no item converts to it any more')
+    cache.save()
+    for item, target_path, first in planned:
+        if target_path in errors:
+            failures += 1
+            continue
+        if not first:
+            skipped += 1
+        info.setdefault(item, []).append(pruned.get(target_path, target_path))
     with open(paths.icon_manifest, 'w') as fp:
         json.dump(info, fp, indent=1)
-    print(f'Converted: {successes} | Skipped (duplicate): {skipped} | Failed: {failures} | No path: {no_information} | Items: {len(items)}')
+    print(f'Converted: {successes} | Cached: {cached} | Pruned (duplicate): {len(pruned)} | Evicted: {len(evicted)} | Skipped (duplicate): {skipped} | Failed: {failures} | No path: {no_information} | Items: {len(items)}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,110 @@
+"""
+Deduplicate converted icons by their decoded pixels.
+
+Mod copies of vanilla textures and `-color` variants often convert to the same image under different names.
+After `convert.main`, every icon in the manifest is hashed by its pixels, one canonical file is kept per distinct
+image and the manifest is rewritten to point at it. `data/icon_aliases.json` maps each duplicate to its canonical
+file for trackers that still use the old names. Other manifests (e.g. stable next to beta) are not rewritten, so
+duplicates they still refer to are never pruned.
+"""
+
+from typing import *
+import hashlib
+import json
+import os
+
+from conversion_cache import hash_file
+from convert import BLIZZARD_DIR, other_manifests, referenced_icons
+from filepaths import Paths
+from png_codec import read_png
+
+PIXEL_HASH_CACHE = 'pixel_hashes.json'
+"""file sha256 -> pixel sha256, under the parse cache directory; decoding is the slow part"""
+
+
+def pixel_hash(path: str) -> str:
+    image = read_png(path)
+    digest = hashlib.sha256(f'{image.width}x{image.height}\0'.encode('utf-8'))
+    digest.update(image.pixels)
+    return digest.hexdigest()
+
+
+def canonical_order(path: str) -> tuple[bool, int, str]:
+    """Prefers the extracted game file over mod copies, then the shortest name"""
+    return (not path.startswith(f'{BLIZZARD_DIR}/'), len(os.path.basename(path)), path)
+
+
+def group_duplicates(icons: Iterable[str], cache: dict[str, str]) -> dict[str, list[str]]:
+    """Returns canonical path -> duplicate paths for every image stored more than once. Updates `cache`"""
+    by_pixels: dict[str, list[str]] = {}
+    for path in icons:
+        file_hash = hash_file(path)
+        if file_hash not in cache:
+            cache[file_hash] = pixel_hash(path)
+        by_pixels.setdefault(cache[file_hash], []).append(path)
+    groups = {}
+    for paths in by_pixels.values():
+        if len(paths) > 1:
+            canonical, *duplicates = sorted(paths, key=canonical_order)
+            groups[canonical] = duplicates
+    return groups
+
+
+def load_json(path: str) -> dict[str, str]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as fp:
+        return json.load(fp)
+
+
+def main(paths: Paths, prune: bool = False, protected_manifests: Iterable[str] | None = None) -> None:
+    """
+    Points every manifest entry at the canonical copy of its image. With `prune`, duplicate files are deleted,
+    except those `protected_manifests` still refer to; by default every other manifest next to this one.
+    """
+    with open(paths.icon_manifest, 'r') as fp:
+        icon_manifest: dict[str, list[str]] = json.load(fp)
+    # Duplicates from an earlier run are checked again, so running twice doesn't forget them
+    previous_aliases = load_json(paths.icon_aliases)
+    icons = {icon for item_icons in icon_manifest.values() for icon in item_icons}
+    icons = sorted(icon for icon in icons.union(previous_aliases) if os.path.isfile(icon))
+    cache_path = os.path.join(paths.parse_cache, PIXEL_HASH_CACHE)
+    cache = load_json(cache_path)
+    groups = group_duplicates(icons, cache)
+    os.makedirs(paths.parse_cache, exist_ok=True)
+    with open(cache_path, 'w') as fp:
+        json.dump(cache, fp)
+
+    aliases = {duplicate: canonical for canonical, duplicates in groups.items() for duplicate in duplicates}
+    for duplicate, canonical in previous_aliases.items():
+        if not os.path.isfile(duplicate) and os.path.isfile(canonical):
+            aliases.setdefault(duplicate, aliases.get(canonical, canonical))
+    present = [duplicate for duplicate in aliases if os.path.isfile(duplicate)]
+    for item, item_icons in icon_manifest.items():
+        # dict.fromkeys() drops icons that became the same file while keeping the first one first
+        icon_manifest[item] = list(dict.fromkeys(aliases.get(icon, icon) for icon in item_icons))
+    with open(paths.icon_manifest, 'w') as fp:
+        json.dump(icon_manifest, fp, indent=1)
+    with open(paths.icon_aliases, 'w') as fp:
+        json.dump(dict(sorted(aliases.items())), fp, indent=1)
+
+    if protected_manifests is None:
+        protected_manifests = other_manifests(paths.icon_manifest)
+    protected = referenced_icons(protected_manifests)
+    kept = [duplicate for duplicate in present if duplicate in protected]
+    prunable = [duplicate for duplicate in present if duplicate not in protected]
+    saved = sum(os.path.getsize(duplicate) for duplicate in prunable)
+    if prune:
+        for duplicate in prunable:
+            os.unlink(duplicate)
+    for canonical, duplicates in sorted(groups.items()):
+        print(f'Duplicate of {canonical}: {", ".join(duplicates)}')
+    print(
+        f'Distinct images: {len(icons) - len(present)} | Duplicates: {len(aliases)} | '
+        f'Kept for other manifests: {len(kept)} | {"Saved" if prune else "Prunable"}: {saved / 1024:.1f} KiB'
+    )
+
+
+if __name__ == '__main__':
+    import sys
+    main(Paths(), prune='--prune' in sys.argv)
@@ -3,16 +3,25 @@ from dataclasses import dataclass
 @dataclass
 class Paths:
     is_beta = False
+    use_sprites = False
+    """Whether the HTML pages show icons from the atlas with CSS sprites"""
     workspace: str = 'workspace.json'
 
     overrides: str = 'data/overrides.json'
     icon_paths: str = 'data/locations.json'
     icon_manifest: str = 'data/icon_manifest.json'
+    icon_aliases: str = 'data/icon_aliases.json'
+    conversion_manifest: str = 'data/conversion_manifest.json'
+    icon_optimization: str = 'data/icon_optimization.json'
     item_data: str = 'data/item_data.json'
     item_groups: str = 'data/item_groups.json'
     mission_data: str = 'data/mission_data.json'
     mission_groups: str = 'data/mission_groups.json'
+    parse_cache: str = 'build/cache'
+    atlas_metadata: str = 'data/atlas.v4.0.0.json'
+    icon_validation: str = 'build/icon_validation.json'
 
     items_html: str = 'index.html'
     item_groups_html: str = 'itemgroups.html'
     mission_groups_html: str = 'missiongroups.html'
+    sprites_css: str = 'styles/sprites.css'
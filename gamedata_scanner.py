@@ -0,0 +1,86 @@
+"""
+Streaming scanner for GameData .xml files.
+
+Each line is dispatched on its leading element name (`CButton`, `/CButton`, `LayoutButtons`, ...)
+with plain string operations, so only the handful of regexes registered for that element are tried.
+"""
+
+from typing import *
+import re
+
+
+Handler = Callable[[Optional[re.Match]], Optional[bool]]
+
+
+class ElementRule(NamedTuple):
+    element: str
+    """Element name to dispatch on, e.g. `CButton` or `/CButton`. A trailing `*` matches any element with that prefix."""
+    pattern: Optional[re.Pattern]
+    handler: Handler
+
+
+def leading_element(line: str) -> str:
+    """
+    Returns the name of the element that opens the line, with a leading `/` for closing tags.
+    Returns an empty string if the line does not start with a tag.
+    """
+    stripped = line.lstrip()
+    if not stripped.startswith('<'):
+        return ''
+    end = stripped.find(' ')
+    if end < 0:
+        return stripped[1:].rstrip().rstrip('/>')
+    return stripped[1:end].rstrip('/>')
+
+
+class ElementScanner:
+    """
+    A table of per-element handlers run over a file in a single streaming pass.
+
+    Rules for the same element are tried in registration order, and the first rule whose pattern matches
+    consumes the line, mirroring an `if`/`elif` chain. A handler may return `False` to decline the line
+    and let later rules try it.
+    """
+    def __init__(self) -> None:
+        self.rules: list[ElementRule] = []
+        self._dispatch: dict[str, tuple[ElementRule, ...]] = {}
+
+    def on(self, element: str, pattern: str | None = None) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self.rules.append(ElementRule(element, re.compile(pattern) if pattern else None, handler))
+            self._dispatch.clear()
+            return handler
+        return decorator
+
+    def rules_for(self, element: str) -> tuple[ElementRule, ...]:
+        rules = self._dispatch.get(element)
+        if rules is None:
+            rules = tuple(
+                rule for rule in self.rules
+                if rule.element == element
+                or (rule.element.endswith('*') and element.startswith(rule.element[:-1]))
+            )
+            self._dispatch[element] = rules
+        return rules
+
+    def scan_line(self, line: str) -> None:
+        element = leading_element(line)
+        if not element:
+            return
+        for _, pattern, handler in self.rules_for(element):
+            if pattern is None:
+                match = None
+            else:
+                match = pattern.match(line)
+                if match is None:
+                    continue
+            if handler(match) is not False:
+                return
+
+    def scan(self, path: str) -> None:
+        with open(path, 'r') as fp:
+            for line_number, line in enumerate(fp, start=1):
+                try:
+                    self.scan_line(line)
+                except AssertionError as ex:
+                    raise AssertionError(f'{path}:{line_number}: {ex} ({line.strip()!r})') from ex
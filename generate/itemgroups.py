@@ -8,29 +8,30 @@ import json
 
 from filepaths import Paths
 from generate.html_common import brief_name, write_table_of_contents, write_topbar_nav
+from generate.sprites import SpriteSheet, load_sprites, stylesheet_link
 
 if TYPE_CHECKING:
     import io
 
 
-def write_start(fp: 'io.FileIO') -> None:
-    fp.write(inspect.cleandoc("""
+def write_start(fp: 'io.FileIO', sprites_link: str = '') -> None:
+    fp.write(inspect.cleandoc(f"""
     <!doctype html>
     <html>
     <head>
         <title>APSC2 Item Groups</title>
         <meta name="description" content="Explanation of Archipelago sc2 item groups"/>
         <meta name="keywords" content="Archipelago Starcraft 2"/>
-        <link rel="stylesheet" href="styles/common.css"/>
+        <link rel="stylesheet" href="styles/common.css"/>{sprites_link}
         <link rel="icon" type="image/png" href="favicon.png"/>
         <style>
-        .itemgroup-container {
+        .itemgroup-container {{
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(25rem, 1fr));
-        }
-        .list-item-label {
+        }}
+        .list-item-label {{
             color: #ebb;
-        }
+        }}
         </style>
     </head>
     <body style="background-color: black; color: #ebb">
@@ -48,7 +49,8 @@ def write_group(
     group_name: str,
     group_contents: Iterable[str],
     icon_manifest: dict[str, list[str]],
-    item_page_rel_path: str
+    item_page_rel_path: str,
+    sprites: SpriteSheet | None = None,
 ) -> None:
     DEFAULT_IMAGE = 'favicon.png'
     fp.write(inspect.cleandoc(f"""
@@ -58,9 +60,12 @@ def write_group(
     """))
     items = sorted(group_contents)
     for item in items:
+        icon = icon_manifest.get(item, [DEFAULT_IMAGE])[0]
+        sprite = sprites.span(icon, 'list-item-icon') if sprites is not None else None
+        icon_html = sprite or f'<img class="list-item-icon" src="{icon}">'
         fp.write(
             f'<div class="group-list-item">'
-            f'<img class="list-item-icon" src="{icon_manifest.get(item, [DEFAULT_IMAGE])[0]}">'
+            f'{icon_html}'
             f'<a class="list-item-label" href="{item_page_rel_path}#{brief_name(item)}">{item}'
             f'</a></div>\n'
         )
@@ -81,13 +86,14 @@ def main(paths: Paths) -> None:
     with open(paths.icon_manifest, 'r') as fp:
         icon_manifest = json.load(fp)
     item_page_rel_path = f'./{paths.items_html}'
+    sprites = load_sprites(paths)
     with open(paths.item_groups_html, 'w', encoding='utf-8') as fp:
-        write_start(fp)
+        write_start(fp, stylesheet_link(paths))
         write_topbar_nav(fp, paths)
         write_table_of_contents(fp, item_groups)
         write_title(fp)
         for group_name, group_contents in item_groups.items():
-            write_group(fp, group_name, group_contents, icon_manifest, item_page_rel_path)
+            write_group(fp, group_name, group_contents, icon_manifest, item_page_rel_path, sprites)
         write_end(fp)
 
 
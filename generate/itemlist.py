@@ -7,6 +7,7 @@ import inspect
 
 from filepaths import Paths
 from generate.html_common import brief_name, write_table_of_contents, write_topbar_nav
+from generate.sprites import SpriteSheet, load_sprites, stylesheet_link
 
 
 EXTRA_NOTES = {
@@ -25,7 +26,7 @@ EXTRA_NOTES = {
 }
 
 
-def write_start(fp: io.FileIO, is_beta: bool) -> None:
+def write_start(fp: io.FileIO, is_beta: bool, sprites_link: str = '') -> None:
     fp.write(inspect.cleandoc(f"""
     <!doctype html>
     <html>
@@ -33,7 +34,7 @@ def write_start(fp: io.FileIO, is_beta: bool) -> None:
         <title>APSC2{" Beta" if is_beta else ""} Item Docs</title>
         <meta name="description" content="A repository of Starcraft 2 icons used in Archipelago"/>
         <meta name="keywords" content="Archipelago Starcraft 2"/>
-        <link rel="stylesheet" href="styles/common.css"/>
+        <link rel="stylesheet" href="styles/common.css"/>{sprites_link}
         <link rel="icon" type="image/png" href="favicon.png"/>
         <style>
         img {{
@@ -57,7 +58,7 @@ def write_title(fp: 'io.FileIO', is_beta: bool) -> None:
     fp.write('</p>')
 
 
-def write_item(fp: io.FileIO, item_name: str, item_info: str, icon_locations: list[str]) -> None:
+def write_item(fp: io.FileIO, item_name: str, item_info: str, icon_locations: list[str], sprites: SpriteSheet | None = None) -> None:
     fp.write(inspect.cleandoc(f"""
     <div id="{item_name}">
         <a id="{brief_name(item_name)}"></a><a href="#{brief_name(item_name)}" class="item-title"><h2>{item_name}</h2></a>
@@ -67,7 +68,8 @@ def write_item(fp: io.FileIO, item_name: str, item_info: str, icon_locations: li
     if not icon_locations:
         fp.write('<p class="error">Icon unavailable</p>')
     for location in icon_locations:
-        fp.write(f'<img src="{location}"/>')
+        sprite = sprites.span(location) if sprites is not None else None
+        fp.write(sprite or f'<img src="{location}"/>')
     note = EXTRA_NOTES.get(item_name, "")
     if note:
         note = f"\n        <li>{note}</li>"
@@ -106,13 +108,14 @@ def main(paths: Paths) -> None:
         item_data = json.load(fp)
     with open(paths.icon_manifest, 'r') as fp:
         icon_manifest = json.load(fp)
+    sprites = load_sprites(paths)
     with open(paths.items_html, 'w', encoding='utf-8') as fp:
-        write_start(fp, paths.is_beta)
+        write_start(fp, paths.is_beta, stylesheet_link(paths))
         write_topbar_nav(fp, paths)
         write_table_of_contents(fp, item_data, sort_func=item_sort_func)
         write_title(fp, paths.is_beta)
         for item in item_data:
-            write_item(fp, item, item_data[item], icon_manifest.get(item, []))
+            write_item(fp, item, item_data[item], icon_manifest.get(item, []), sprites)
         write_end(fp)
 
 if __name__ == '__main__':
@@ -8,26 +8,27 @@ import json
 
 from filepaths import Paths
 from generate.html_common import brief_name, write_table_of_contents, write_topbar_nav
+from generate.sprites import SpriteSheet, load_sprites, stylesheet_link
 
 if TYPE_CHECKING:
     import io
 
 
-def write_start(fp: 'io.FileIO') -> None:
-    fp.write(inspect.cleandoc("""
+def write_start(fp: 'io.FileIO', sprites_link: str = '') -> None:
+    fp.write(inspect.cleandoc(f"""
     <!doctype html>
     <html>
     <head>
         <title>APSC2 Mission Groups</title>
         <meta name="description" content="Explanation of Archipelago sc2 mission groups"/>
         <meta name="keywords" content="Archipelago Starcraft 2"/>
-        <link rel="stylesheet" href="styles/common.css"/>
+        <link rel="stylesheet" href="styles/common.css"/>{sprites_link}
         <link rel="icon" type="image/png" href="favicon.png"/>
         <style>
-        .missiongroup-container {
+        .missiongroup-container {{
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(15rem, 1fr));
-        }
+        }}
         </style>
     </head>
     <body style="background-color: black; color: #ebb">
@@ -48,7 +49,8 @@ def write_group(
     group_name: str,
     group_contents: Iterable[str],
     mission_data: dict[str, dict[str, str]],
-    icons: dict[str, list[str]]
+    icons: dict[str, list[str]],
+    sprites: SpriteSheet | None = None,
 ) -> None:
     DEFAULT_IMAGE = 'favicon.png'
     fp.write(inspect.cleandoc(f"""
@@ -67,9 +69,11 @@ def write_group(
             icon = icons['_protoss'][0]
         else:
             icon = DEFAULT_IMAGE
+        sprite = sprites.span(icon, 'list-item-icon') if sprites is not None else None
+        icon_html = sprite or f'<img class="list-item-icon" src="{icon}">'
         fp.write(
             f'<div class="group-list-item">'
-            f'<img class="list-item-icon" src="{icon}">'
+            f'{icon_html}'
             f'<p class="list-item-label">{item}</p>'
             f'</div>'
         )
@@ -91,13 +95,14 @@ def main(paths: Paths) -> None:
         mission_groups: dict[str, list[str]] = json.load(fp)
     with open(paths.icon_manifest, 'r') as fp:
         icons: dict[str, list[str]] = json.load(fp)
+    sprites = load_sprites(paths)
     with open(paths.mission_groups_html, 'w', encoding='utf-8') as fp:
-        write_start(fp)
+        write_start(fp, stylesheet_link(paths))
         write_topbar_nav(fp, paths)
         write_table_of_contents(fp, mission_groups)
         write_title(fp, paths.is_beta)
         for group_name, group_contents in mission_groups.items():
-            write_group(fp, group_name, group_contents, mission_data, icons)
+            write_group(fp, group_name, group_contents, mission_data, icons, sprites)
         write_end(fp)
 
 
@@ -0,0 +1,104 @@
+"""
+CSS sprites backed by the texture atlas, so a page downloads one atlas image instead of every icon.
+
+Every icon in the atlas metadata gets a class positioning the atlas page behind an element. Icons are looked up by
+their manifest path, so an icon the atlas skipped for sharing a file name with another keeps its own <img>.
+Sprites are `--sprite-size` wide and tall (76px by default) and scale the page to match, so they can stand in
+for icons shown at any size.
+"""
+
+from typing import *
+import json
+import os
+
+from filepaths import Paths
+
+
+REQUIRED_KEYS = ('tile_size', 'pages', 'order', 'icons', 'paths')
+"""metadata keys the sprites need; older atlas metadata only has some of them"""
+
+
+class SpriteSheet:
+    def __init__(self, metadata: dict[str, Any]) -> None:
+        self.metadata = metadata
+        self.names = {os.path.normpath(path): name for path, name in metadata['paths'].items()}
+        """icon path -> atlas name"""
+
+    @classmethod
+    def load(cls, paths: Paths) -> 'SpriteSheet':
+        with open(paths.atlas_metadata, 'r') as fp:
+            metadata = json.load(fp)
+        missing = [key for key in REQUIRED_KEYS if key not in metadata]
+        if missing:
+            raise ValueError(
+                f'{paths.atlas_metadata} is missing {", ".join(missing)}; run generate_atlas.py to rebuild the atlas '
+                'before using sprites'
+            )
+        return cls(metadata)
+
+    def classes(self, icon_path: str) -> str | None:
+        """The sprite classes of an icon, or None if it isn't in the atlas"""
+        name = self.names.get(os.path.normpath(icon_path))
+        if name is None:
+            return None
+        return f'sprite sprite-page-{self.metadata["icons"][name]["page"]} sprite-{self.metadata["order"][name]}'
+
+    def span(self, icon_path: str, css_class: str = '') -> str | None:
+        """An element showing the icon from the atlas, or None if it isn't in the atlas"""
+        classes = self.classes(icon_path)
+        if classes is None:
+            return None
+        if css_class:
+            classes = f'{css_class} {classes}'
+        return f'<span class="{classes}" role="img" aria-label="{os.path.basename(icon_path)}"></span>'
+
+    def css(self, css_dir: str) -> str:
+        """The stylesheet, with atlas URLs relative to `css_dir`"""
+        tile_size = self.metadata['tile_size']
+        lines = [
+            '.sprite {',
+            f'    --sprite-size: {tile_size}px;',
+            '    display: inline-block;',
+            '    width: var(--sprite-size);',
+            '    height: var(--sprite-size);',
+            '    background-repeat: no-repeat;',
+            '}',
+            '.list-item-icon.sprite {',
+            '    --sprite-size: 1.4em;',
+            '}',
+        ]
+        for index, page in enumerate(self.metadata['pages']):
+            url = os.path.relpath(page['file'], css_dir).replace('\\', '/')
+            columns = page['width'] // tile_size
+            rows = page['height'] // tile_size
+            lines.append(
+                f".sprite-page-{index} {{ background-image: url('{url}'); "
+                f"background-size: calc(var(--sprite-size) * {columns}) calc(var(--sprite-size) * {rows}); }}"
+            )
+        for name, slot in sorted(self.metadata['order'].items(), key=lambda item: item[1]):
+            rect = self.metadata['icons'][name]
+            column = rect['x'] // tile_size
+            row = rect['y'] // tile_size
+            lines.append(
+                f'.sprite-{slot} {{ background-position: calc(var(--sprite-size) * -{column}) calc(var(--sprite-size) * -{row}); }}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def load_sprites(paths: Paths) -> SpriteSheet | None:
+    """The sprite sheet if the pages should use sprites, else None"""
+    return SpriteSheet.load(paths) if paths.use_sprites else None
+
+
+def stylesheet_link(paths: Paths) -> str:
+    return f'<link rel="stylesheet" href="{paths.sprites_css}"/>' if paths.use_sprites else ''
+
+
+def main(paths: Paths) -> None:
+    sprites = SpriteSheet.load(paths)
+    with open(paths.sprites_css, 'w') as fp:
+        fp.write(sprites.css(os.path.dirname(paths.sprites_css)))
+
+
+if __name__ == '__main__':
+    main(Paths())
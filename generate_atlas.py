@@ -1,55 +1,379 @@
-import subprocess
-import os
-import glob
+"""
+Pack every icon in the manifest into a texture atlas of 76x76 tiles ordered by file name.
+
+The default layout is a single vertical strip. A square grid layout and a maximum page size split the icons over
+as many pages as needed instead, and optional mip levels repeat every page at smaller tile sizes. The metadata
+records the slot, page and rectangle of every icon.
+
+In incremental mode the previous metadata and pages are reused: icons keep their slots, removed icons free theirs,
+new icons fill free slots before going at the end, and only the tiles of new or changed icons are drawn.
+The metadata lists the slots that changed since the previous version.
+
+Optionally, an item name -> rectangle table is written as JSON and as a binary index; see `atlas_index`,
+and every page is also written uncompressed for memory-mapping; see `raw_atlas`.
+
+Icons are decoded and resized in-process over a process pool, then copied into preallocated page buffers
+and composited over black, the way `magick montage -background black` did. Resized tiles are kept in a `tile_cache`.
+"""
+
+from typing import *
+import concurrent.futures
+import itertools
 import json
-import shutil
+import math
+import os
+
+from atlas_index import item_rects, write_item_tables
+from conversion_cache import hash_file
+from png_codec import RGBAImage, read_png, write_png
+from raw_atlas import raw_path, write_raw, FORMAT_RGBA8, FORMAT_RGBA8_PREMULTIPLIED
+from resample import resize
+from tile_cache import TileCache, TILE_CACHE_DIR
+
+ICON_SIZE = 76
+STRIP = 'strip'
+GRID = 'grid'
+ATLAS_COMPRESS_LEVEL = 6
+"""The atlas is large, and level 9 takes several times longer for a few percent"""
+
+
+def over_black(pixels: bytearray) -> None:
+    """Composites RGBA pixels over opaque black, in place"""
+    if pixels[3::4].count(255) == len(pixels) // 4:
+        return
+    for offset in range(0, len(pixels), 4):
+        alpha = pixels[offset + 3]
+        if alpha != 255:
+            pixels[offset] = (pixels[offset] * alpha + 127) // 255
+            pixels[offset + 1] = (pixels[offset + 1] * alpha + 127) // 255
+            pixels[offset + 2] = (pixels[offset + 2] * alpha + 127) // 255
+            pixels[offset + 3] = 255
+
+
+def load_icon(path: str, size: int = ICON_SIZE, mip_sizes: Sequence[int] = ()) -> list[bytes]:
+    """
+    The pixels of the icon at `path`, resized to `size` x `size` and composited over black,
+    followed by the pixels of each mip level
+    """
+    pixels = bytearray(resize(read_png(path), size, size).pixels)
+    over_black(pixels)
+    tile = RGBAImage(size, size, bytes(pixels))
+    return [tile.pixels] + [resize(tile, mip_size, mip_size).pixels for mip_size in mip_sizes]
+
+
+def load_icons(paths: list[str], size: int = ICON_SIZE, mip_sizes: Sequence[int] = (), workers: int = 1) -> Iterator[list[bytes]]:
+    """The levels of each icon in `paths`, in order"""
+    if workers <= 1:
+        yield from (load_icon(path, size, mip_sizes) for path in paths)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(load_icon, paths, itertools.repeat(size), itertools.repeat(mip_sizes), chunksize=16)
+
+
+class Placement(NamedTuple):
+    page: int
+    column: int
+    row: int
+
+
+def max_tiles_for(max_page_size: int | None, tile_size: int = ICON_SIZE) -> int | None:
+    if max_page_size is None:
+        return None
+    if max_page_size < tile_size:
+        raise ValueError(f'maximum page size {max_page_size} is smaller than a {tile_size}px tile')
+    return max_page_size // tile_size
+
+
+def new_page_columns(num_slots: int, layout: str, max_tiles: int | None) -> list[int]:
+    """The columns of each new page needed for `num_slots` slots"""
+    if layout == STRIP:
+        per_page = max_tiles or num_slots
+    elif layout == GRID:
+        per_page = max_tiles ** 2 if max_tiles else num_slots
+    else:
+        raise ValueError(f'unknown atlas layout {layout!r}')
+    return [
+        1 if layout == STRIP else math.ceil(math.sqrt(min(per_page, num_slots - first)))
+        for first in range(0, num_slots, max(per_page, 1))
+    ]
+
+
+def plan_pages(
+    num_slots: int, layout: str, max_page_size: int | None, page_columns: Sequence[int] = ()
+) -> tuple[list[tuple[int, int]], list[Placement]]:
+    """
+    Returns the (columns, rows) of every page and the placement of every slot, filling pages in order.
+    Pages keep the widths in `page_columns` so slots never move; they grow downwards until `max_page_size`.
+    """
+    max_tiles = max_tiles_for(max_page_size)
+    columns = list(page_columns)
+    pages: list[tuple[int, int]] = []
+    placements: list[Placement] = []
+    while len(placements) < num_slots:
+        remaining = num_slots - len(placements)
+        if len(pages) == len(columns):
+            columns.extend(new_page_columns(remaining, layout, max_tiles))
+        width = columns[len(pages)]
+        count = min(remaining, width * max_tiles) if max_tiles else remaining
+        placements.extend(Placement(len(pages), index % width, index // width) for index in range(count))
+        pages.append((width, math.ceil(count / width)))
+    return pages, placements
+
+
+class SlotChanges(NamedTuple):
+    added: dict[str, int]
+    """icon -> its new slot, for icons that are new or moved"""
+    removed: dict[str, int]
+    """icon -> its old slot, for icons that are gone or moved"""
+    updated: list[str]
+    """icons that kept their slot but whose image changed"""
 
-MAGICK = 'magick'
-if not shutil.which(MAGICK):
-    with open('workspace.json', 'r') as fp:
-        workspace = json.load(fp)
-    # Note(mm): This script requires magick v7
-    # Note(mm): On Linux, it can be downloaded from https://imagemagick.org/script/download.php
-    MAGICK = workspace['magick']
+
+def assign_slots(names: Iterable[str], previous_slots: dict[str, int]) -> dict[str, int]:
+    """Keeps the slot of every icon still present; new icons fill freed slots lowest first, then go at the end"""
+    names = sorted(names)
+    slots = {name: previous_slots[name] for name in names if name in previous_slots}
+    end = max(previous_slots.values(), default=-1) + 1
+    free = sorted(set(range(end)).difference(slots.values()))
+    new_names = [name for name in names if name not in slots]
+    slots.update(zip(new_names, itertools.chain(free, itertools.count(end))))
+    return dict(sorted(slots.items()))
+
+
+def slot_changes(slots: dict[str, int], hashes: dict[str, str], previous: dict[str, Any]) -> SlotChanges:
+    previous_slots: dict[str, int] = previous.get('order', {})
+    previous_icons: dict[str, dict] = previous.get('icons', {})
+    return SlotChanges(
+        {name: slot for name, slot in slots.items() if previous_slots.get(name) != slot},
+        {name: slot for name, slot in previous_slots.items() if slots.get(name) != slot},
+        [
+            name for name, slot in slots.items()
+            if previous_slots.get(name) == slot and previous_icons.get(name, {}).get('hash') != hashes[name]
+        ],
+    )
+
+
+class AtlasPage:
+    def __init__(self, columns: int, rows: int, tile_size: int, image: RGBAImage | None = None) -> None:
+        """A blank page, or one starting from the top of an earlier `image` of the same width"""
+        self.tile_size = tile_size
+        self.width = columns * tile_size
+        self.height = rows * tile_size
+        self.pixels = bytearray(self.width * self.height * 4)
+        if image is not None and image.width == self.width:
+            kept = min(len(image.pixels), len(self.pixels))
+            self.pixels[:kept] = image.pixels[:kept]
+
+    def paste(self, column: int, row: int, tile: bytes) -> None:
+        tile_stride = self.tile_size * 4
+        page_stride = self.width * 4
+        if self.width == self.tile_size:
+            # In a single column each tile is a contiguous run of rows
+            offset = row * self.tile_size * page_stride
+            self.pixels[offset:offset + len(tile)] = tile
+            return
+        offset = row * self.tile_size * page_stride + column * tile_stride
+        for line in range(self.tile_size):
+            self.pixels[offset:offset + tile_stride] = tile[line * tile_stride:(line + 1) * tile_stride]
+            offset += page_stride
+
+    def clear(self, column: int, row: int) -> None:
+        self.paste(column, row, bytes(self.tile_size * self.tile_size * 4))
+
+    def image(self) -> RGBAImage:
+        return RGBAImage(self.width, self.height, bytes(self.pixels))
+
+
+def page_file(atlas_file: str, page: int, num_pages: int, tile_size: int = ICON_SIZE) -> str:
+    """`icons/atlas.png` for a single full-size page, else e.g. `icons/atlas.1.png` or `icons/atlas.1.38px.png`"""
+    stem, extension = os.path.splitext(atlas_file)
+    if num_pages > 1:
+        stem += f'.{page}'
+    if tile_size != ICON_SIZE:
+        stem += f'.{tile_size}px'
+    return stem + extension
+
+
+def atlas_order(icons: Iterable[str]) -> dict[str, str]:
+    """file name -> icon path, sorted by file name. Of icons sharing a file name, the first by path is used"""
+    by_name: dict[str, str] = {}
+    for icon in sorted(icons):
+        name = os.path.basename(icon)
+        # if name == 'btn-ability-mengsk-trooper-advancedconstruction.png':
+        #     # The things I do for backwards compatibility...
+        #     name = 'btn-advanced-construction.png'
+        if name in by_name:
+            print(f'Skipping {icon}: {by_name[name]} has the same file name')
+            continue
+        by_name[name] = icon
+    return dict(sorted(by_name.items()))
+
+
+def load_previous(metadata_out: str, layout: str, max_page_size: int | None, mip_sizes: Sequence[int]) -> dict[str, Any] | None:
+    """The previous metadata if its pages exist and were built with the same settings, else None"""
+    if not os.path.isfile(metadata_out):
+        return None
+    with open(metadata_out, 'r') as fp:
+        previous = json.load(fp)
+    settings = (previous.get('layout'), previous.get('max_page_size'), previous.get('tile_size'), previous.get('mips', {}).keys())
+    if settings != (layout, max_page_size, ICON_SIZE, {str(tile_size) for tile_size in mip_sizes}):
+        print(f'Rebuilding the whole atlas: {metadata_out} was built with different settings')
+        return None
+    files = [page['file'] for page in previous['pages']] + [path for paths in previous['mips'].values() for path in paths]
+    missing = [path for path in files if not os.path.isfile(path)]
+    if missing:
+        print(f'Rebuilding the whole atlas: {", ".join(missing)} missing')
+        return None
+    return previous
 
 
 def create_texture_atlas(
-    icon_manifest_path: str, atlas_file: str, metadata_out: str, clean_build: bool = False
+    icon_manifest_path: str, atlas_file: str, metadata_out: str, workers: int | None = None,
+    layout: str = STRIP, max_page_size: int | None = None, mip_sizes: Sequence[int] = (), incremental: bool = False,
+    tile_cache_dir: str | None = TILE_CACHE_DIR, item_table_out: str | None = None, raw_format: int | None = None,
 ) -> None:
+    """
+    `item_table_out` is the path of the item table's JSON; the binary index goes next to it with a .bin extension.
+    With a `raw_format` from `raw_atlas`, every page is also written as a raw .rgba file next to its PNG.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
     with open(icon_manifest_path, 'r') as fp:
         icon_manifest: dict[str, list[str]] = json.load(fp)
     icons = set(inner for x in icon_manifest.values() for inner in x)
-    if os.path.isdir('build') and clean_build:
-        shutil.rmtree('build')
-    os.makedirs('build', exist_ok=True)
+    for icon in icons:
+        assert os.path.isfile(icon), f'icon {icon} does not exist'
+    order = atlas_order(icons)
+    hashes = {name: hash_file(icon) for name, icon in order.items()}
+    tile_sizes = [ICON_SIZE, *mip_sizes]
 
-    num_icons = len(icons)
-    print(f"Converting {num_icons} icons")
+    if os.path.isfile(metadata_out):
+        with open(metadata_out, 'r') as fp:
+            previous_metadata = json.load(fp)
+    else:
+        previous_metadata = {}
+    previous = load_previous(metadata_out, layout, max_page_size, mip_sizes) if incremental else None
+    if previous is not None:
+        slots = assign_slots(order, previous['order'])
+        page_columns = [page['width'] // ICON_SIZE for page in previous['pages']]
+    else:
+        slots = {name: index for index, name in enumerate(order)}
+        page_columns = []
+    changes = slot_changes(slots, hashes, previous_metadata)
+    num_slots = max(slots.values(), default=-1) + 1
+    page_sizes, placements = plan_pages(num_slots, layout, max_page_size, page_columns)
+
+    levels: list[list[AtlasPage]] = []
+    dirty: set[int] = set()
+    """pages that need writing"""
+    for level, tile_size in enumerate(tile_sizes):
+        previous_files = []
+        if previous is not None:
+            previous_files = [page['file'] for page in previous['pages']] if level == 0 else previous['mips'][str(tile_size)]
+        pages = []
+        for index, (columns, rows) in enumerate(page_sizes):
+            image = read_png(previous_files[index]) if index < len(previous_files) else None
+            pages.append(AtlasPage(columns, rows, tile_size, image))
+            if image is None or (image.width, image.height) != (pages[-1].width, pages[-1].height):
+                dirty.add(index)
+        levels.append(pages)
+
+    if previous is None:
+        redraw = list(order)
+    else:
+        redraw = sorted(set(changes.added).union(changes.updated))
+        used = set(slots.values())
+        for name, slot in changes.removed.items():
+            if slot < num_slots and slot not in used:
+                placement = placements[slot]
+                for pages in levels:
+                    pages[placement.page].clear(placement.column, placement.row)
+                dirty.add(placement.page)
+    print(f"Packing {len(redraw)} of {len(order)} icons into {len(page_sizes)} {layout} page(s)")
+
+    def draw(name: str, tiles: list[bytes]) -> None:
+        placement = placements[slots[name]]
+        for pages, tile in zip(levels, tiles):
+            pages[placement.page].paste(placement.column, placement.row, tile)
+        dirty.add(placement.page)
+
+    cache = TileCache(tile_cache_dir) if tile_cache_dir is not None else None
+    keys = {name: TileCache.key(hashes[name], tile_sizes) for name in redraw}
+    uncached = []
+    for name in redraw:
+        tiles = cache.get(keys[name], tile_sizes) if cache is not None else None
+        if tiles is None:
+            uncached.append(name)
+        else:
+            draw(name, tiles)
+    for index, (name, tiles) in enumerate(zip(uncached, load_icons([order[name] for name in uncached], ICON_SIZE, mip_sizes, workers)), start=1):
+        draw(name, tiles)
+        if cache is not None:
+            cache.put(keys[name], order[name], hashes[name], tiles)
+        if len(uncached) >= 10 and index % (len(uncached) // 10) == 0:
+            print(f"Drawing: {index}/{len(uncached)}")
+    if cache is not None:
+        evicted, evicted_bytes = cache.evict({order[name]: hashes[name] for name in order})
+        cache.save()
+        print(f'Tile cache: {cache.hits} hit(s), {cache.misses} miss(es), evicted {evicted} ({evicted_bytes / 2**20:.1f} MiB)')
+
+    files: dict[int, list[str]] = {}
+    previous_files = {page['file'] for page in previous_metadata.get('pages', [])}
+    previous_files.update(path for paths in previous_metadata.get('mips', {}).values() for path in paths)
+    for tile_size, pages in zip(tile_sizes, levels):
+        files[tile_size] = [page_file(atlas_file, page, len(pages), tile_size) for page in range(len(pages))]
+        for index, (path, page) in enumerate(zip(files[tile_size], pages)):
+            changed = index in dirty or path not in previous_files or previous is None
+            raw_changed = raw_format is not None and (
+                changed or previous_metadata.get('raw_format') != raw_format or not os.path.isfile(raw_path(path))
+            )
+            image = page.image() if changed or raw_changed else None
+            if changed:
+                write_png(path, image, compress_level=ATLAS_COMPRESS_LEVEL)
+            if raw_changed:
+                write_raw(raw_path(path), image, premultiplied=raw_format == FORMAT_RGBA8_PREMULTIPLIED)
+            elif raw_format is None and os.path.isfile(raw_path(path)):
+                os.unlink(raw_path(path))
+    for path in sorted(previous_files.difference(*files.values())):
+        for stale_path in (path, raw_path(path)):
+            if os.path.isfile(stale_path):
+                os.unlink(stale_path)
 
-    for index, icon in enumerate(icons, start=1):
-        target_file = f'build/{os.path.basename(icon)}'
-        # if os.path.basename(icon) == 'btn-ability-mengsk-trooper-advancedconstruction.png':
-        #     # The things I do for backwards compatibility...
-        #     target_file = f'build/btn-advanced-construction.png'
-        if not os.path.isfile(target_file):
-            subprocess.call([MAGICK, icon, '-resize', r'76x76\!', target_file])
-        stats = subprocess.run([MAGICK, 'identify', target_file], stdout=subprocess.PIPE)
-        parts = stats.stdout.decode('utf-8').split(' ', 3)
-        assert parts[2] == '76x76', f"icon {icon} is {parts[2]}"
-        if index % (num_icons // 10) == 0:
-            print(f"Converting: {index}/{num_icons}")
-    for icon in icons:
-        assert os.path.isfile(icon)
-    if os.path.isfile(atlas_file):
-        os.unlink(atlas_file)
-    subprocess.call([MAGICK, 'montage', '-mode', 'concatenate', '-tile', '1x', '-background', 'black', 'build/*.png', atlas_file])
-    image_order = sorted([os.path.basename(x) for x in glob.glob('build/*.png')])
     metadata = {
-        'num_images': len(image_order),
-        'order': {image: index for index, image in enumerate(image_order)},
+        'num_images': len(order),
+        'order': slots,
+        'paths': {icon: name for name, icon in order.items()},
+        'num_slots': num_slots,
+        'free_slots': sorted(set(range(num_slots)).difference(slots.values())),
+        'layout': layout,
+        'max_page_size': max_page_size,
+        'tile_size': ICON_SIZE,
+        'pages': [
+            {'file': path, 'width': page.width, 'height': page.height}
+            for path, page in zip(files[ICON_SIZE], levels[0])
+        ],
+        'mips': {str(tile_size): files[tile_size] for tile_size in mip_sizes},
+        'raw_format': raw_format,
+        'icons': {
+            name: {
+                'page': placements[slot].page,
+                'x': placements[slot].column * ICON_SIZE,
+                'y': placements[slot].row * ICON_SIZE,
+                'w': ICON_SIZE,
+                'h': ICON_SIZE,
+                'hash': hashes[name],
+            }
+            for name, slot in slots.items()
+        },
+        'changes': changes._asdict(),
     }
     with open(metadata_out, 'w') as fp:
         json.dump(metadata, fp)
+    if item_table_out is not None:
+        rects = item_rects(icon_manifest, metadata['icons'])
+        write_item_tables(item_table_out, os.path.splitext(item_table_out)[0] + '.bin', rects, ICON_SIZE)
+        print(f'Item table: {len(rects)} of {len(icon_manifest)} items')
+    print(f'Slots: {len(changes.added)} added, {len(changes.removed)} removed, {len(changes.updated)} updated, {len(metadata["free_slots"])} free')
 
 
 if __name__ == '__main__':
@@ -58,5 +382,8 @@ if __name__ == '__main__':
         'data/icon_manifest.json',
         'icons/atlas.v4.0.0.png',
         'data/atlas.v4.0.0.json',
-        # clean_build=True,
+        item_table_out='data/atlas.v4.0.0.items.json',
+        # raw_format=FORMAT_RGBA8,
+        # layout=GRID, max_page_size=2048, mip_sizes=(38, 19),
+        incremental=True,
     )
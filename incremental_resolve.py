@@ -0,0 +1,144 @@
+"""
+Incremental item icon resolution.
+
+Resolving an item is traced to the individual map entries it reads. The traces and a snapshot of every entry read
+are kept between runs, so on the next run only the items that read a changed entry are resolved again.
+"""
+
+from typing import *
+import os
+import pickle
+
+MISSING = '<missing>'
+
+Dependency = tuple
+"""(map name, key) for a single entry, or (map name,) for a read of the whole map"""
+
+
+class TracedMap(Mapping):
+    """Read-only view of a mapping that records every key looked up in it."""
+    def __init__(self, name: str, data: Mapping, reads: set[Dependency]) -> None:
+        self.name = name
+        self.data = data
+        self.reads = reads
+
+    def __getitem__(self, key: Hashable) -> Any:
+        self.reads.add((self.name, key))
+        return self.data[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self.reads.add((self.name, key))
+        return self.data.get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        self.reads.add((self.name, key))
+        return key in self.data
+
+    def __iter__(self) -> Iterator:
+        self.reads.add((self.name,))
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        self.reads.add((self.name,))
+        return len(self.data)
+
+
+def trace_inputs(inputs: dict[str, Any], reads: set[Dependency]) -> dict[str, TracedMap]:
+    return {name: TracedMap(name, value, reads) for name, value in inputs.items()}
+
+
+def traced(resolve: Callable[..., list[str]], inputs: dict[str, Any]) -> Callable[[str, set[Dependency]], list[str]]:
+    return lambda item_name, reads: resolve(item_name, **trace_inputs(inputs, reads))
+
+
+def lookup(dependency: Dependency, maps: dict[str, Mapping]) -> Any:
+    data = maps.get(dependency[0], {})
+    if len(dependency) == 1:
+        return data
+    return data.get(dependency[1], MISSING)
+
+
+class ResolveState(NamedTuple):
+    version: int
+    results: dict[str, list[str]]
+    dependencies: dict[str, frozenset[Dependency]]
+    snapshots: dict[Dependency, Any]
+
+
+class IncrementalResolver:
+    """
+    Wraps a resolve function `resolve(item_name, reads)` that adds every (input name, key) it looks up to `reads`,
+    persisting per-item results and the map entries each resolution read to `state_path`.
+    `traced(resolve_function, inputs)` adapts a function taking the inputs as keyword arguments.
+    """
+    def __init__(self, resolve: Callable[[str, set[Dependency]], list[str]], state_path: str, version: int) -> None:
+        self.resolve = resolve
+        self.state_path = state_path
+        self.version = version
+
+    def load_state(self) -> ResolveState | None:
+        try:
+            with open(self.state_path, 'rb') as fp:
+                state = pickle.load(fp)
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            print(f'Ignoring unreadable resolve state {self.state_path}: {ex}')
+            return None
+        if not isinstance(state, ResolveState) or state.version != self.version:
+            return None
+        return state
+
+    def save_state(self, state: ResolveState) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as fp:
+            pickle.dump(state, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.state_path)
+
+    def resolve_all(self, item_names: Iterable[str], inputs: dict[str, Any]) -> tuple[dict[str, list[str]], list[str]]:
+        """
+        Resolve every item, re-using previous results for items whose inputs did not change.
+        Returns the results in `item_names` order and the names of items whose result changed, appeared or disappeared.
+        """
+        previous = self.load_state()
+        snapshots: dict[Dependency, Any] = {}
+        stale: set[str] = set()
+        if previous is not None:
+            readers: dict[Dependency, list[str]] = {}
+            for item_name, dependencies in previous.dependencies.items():
+                for dependency in dependencies:
+                    readers.setdefault(dependency, []).append(item_name)
+            for dependency, item_names_reading in readers.items():
+                snapshots[dependency] = lookup(dependency, inputs)
+                if snapshots[dependency] != previous.snapshots.get(dependency, MISSING):
+                    stale.update(item_names_reading)
+
+        results: dict[str, list[str]] = {}
+        dependencies: dict[str, frozenset[Dependency]] = {}
+        changed: list[str] = []
+        resolved = 0
+        for item_name in item_names:
+            if previous is not None and item_name in previous.results and item_name not in stale:
+                results[item_name] = previous.results[item_name]
+                dependencies[item_name] = previous.dependencies[item_name]
+                continue
+            resolved += 1
+            reads: set[Dependency] = set()
+            results[item_name] = self.resolve(item_name, reads)
+            dependencies[item_name] = frozenset(reads)
+            if previous is None or results[item_name] != previous.results.get(item_name):
+                changed.append(item_name)
+        if previous is not None:
+            changed.extend(item_name for item_name in previous.results if item_name not in results)
+            if not resolved and len(results) == len(previous.results):
+                return results, changed
+
+        for item_dependencies in dependencies.values():
+            for dependency in item_dependencies:
+                if dependency not in snapshots:
+                    snapshots[dependency] = lookup(dependency, inputs)
+        used = set().union(*dependencies.values())
+        snapshots = {dependency: value for dependency, value in snapshots.items() if dependency in used}
+        self.save_state(ResolveState(self.version, results, dependencies, snapshots))
+        return results, changed
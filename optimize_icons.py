@@ -0,0 +1,155 @@
+"""
+Losslessly recompress the published icons.
+
+Each icon in the manifest is re-encoded as every combination of colour type (including a palette when the image has
+at most 256 colours), row filter and deflate strategy, and the smallest result is kept if it beats the file on disk.
+The search is deterministic, so the same input always gives the same bytes. `data/icon_optimization.json` records
+the size of every icon before and after along with its hash, so only icons that changed since are recompressed.
+"""
+
+from typing import *
+import concurrent.futures
+import hashlib
+import json
+import os
+import struct
+import zlib
+
+from conversion_cache import ConversionCache, hash_file
+from filepaths import Paths
+from png_codec import (
+    RGBAImage, PALETTE, CHANNELS, FILTER_NONE, FILTER_SUB, FILTER_UP, FILTER_AVERAGE, FILTER_PAETH, FILTER_ADAPTIVE,
+    PNGFormatError, iter_chunks, decode_png, colour_type_for, pack_channels, palette_for, filter_scanlines, build_png,
+)
+
+OPTIMIZATION_VERSION = 1
+"""Change when the search changes, so every icon is recompressed"""
+KEPT_CHUNKS = (b'cHRM', b'gAMA', b'sRGB', b'iCCP')
+"""Ancillary chunks that can change how an icon is displayed; everything else is dropped"""
+FILTERS = (FILTER_NONE, FILTER_SUB, FILTER_UP, FILTER_AVERAGE, FILTER_PAETH, FILTER_ADAPTIVE)
+STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+
+class OptimizedIcon(NamedTuple):
+    path: str
+    before: int
+    after: int
+    output_hash: str
+    error: str | None = None
+
+
+def deflate(raw: bytes, strategy: int) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def smallest_encoding(image: RGBAImage, extra_chunks: list[tuple[bytes, bytes]]) -> bytes:
+    colour_type = colour_type_for(image.pixels)
+    layouts = [(colour_type, pack_channels(image.pixels, colour_type), b'', b'')]
+    palette = palette_for(image.pixels)
+    if palette is not None:
+        plte, trns, indices = palette
+        layouts.append((PALETTE, indices, plte, trns))
+    best = None
+    for colour_type, samples, plte, trns in layouts:
+        channels = CHANNELS[colour_type]
+        for filter_type in FILTERS:
+            raw = filter_scanlines(samples, image.height, image.width * channels, channels, filter_type)
+            for strategy in STRATEGIES:
+                data = build_png(image.width, image.height, colour_type, deflate(raw, strategy), plte, trns, extra_chunks)
+                # Strictly smaller, so ties always go to the earlier candidate
+                if best is None or len(data) < len(best):
+                    best = data
+    return best
+
+
+def optimize_icon(path: str) -> OptimizedIcon:
+    """
+    Rewrites `path` with its smallest encoding if that is smaller than the file, after checking it decodes the same.
+    Errors are returned rather than raised, and leave the file as it was.
+    An unreadable file is returned with no hash, so it is tried again next run.
+    """
+    try:
+        with open(path, 'rb') as fp:
+            original = fp.read()
+    except OSError as ex:
+        return OptimizedIcon(path, 0, 0, '', f'cannot read {path}: {ex}')
+    unchanged = OptimizedIcon(path, len(original), len(original), hashlib.sha256(original).hexdigest())
+    try:
+        extra_chunks = [(chunk_type, data) for chunk_type, data in iter_chunks(original) if chunk_type in KEPT_CHUNKS]
+        image = decode_png(original)
+        optimized = smallest_encoding(image, extra_chunks)
+        if decode_png(optimized) != image:
+            return unchanged._replace(error=f'recompressing {path} changed its pixels')
+    except (PNGFormatError, zlib.error, struct.error) as ex:
+        return unchanged._replace(error=f'cannot recompress {path}: {ex}')
+    if len(optimized) >= len(original):
+        return unchanged
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as fp:
+            fp.write(optimized)
+        os.replace(temp_path, path)
+    except OSError as ex:
+        if os.path.isfile(temp_path):
+            os.unlink(temp_path)
+        return unchanged._replace(error=f'cannot write {path}: {ex}')
+    return OptimizedIcon(path, len(original), len(optimized), hashlib.sha256(optimized).hexdigest())
+
+
+def run_optimizations(icons: list[str], workers: int = 1) -> Iterator[OptimizedIcon]:
+    if workers <= 1:
+        yield from map(optimize_icon, icons)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(optimize_icon, icons, chunksize=4)
+
+
+def load_records(report_path: str) -> dict[str, dict[str, Any]]:
+    if not os.path.isfile(report_path):
+        return {}
+    with open(report_path, 'r') as fp:
+        report = json.load(fp)
+    return report['icons'] if report.get('version') == OPTIMIZATION_VERSION else {}
+
+
+def main(paths: Paths, workers: int | None = None) -> None:
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with open(paths.icon_manifest, 'r') as fp:
+        icon_manifest: dict[str, list[str]] = json.load(fp)
+    icons = sorted({icon for item_icons in icon_manifest.values() for icon in item_icons if os.path.isfile(icon)})
+    records = {path: record for path, record in load_records(paths.icon_optimization).items() if os.path.isfile(path)}
+    changed = [icon for icon in icons if icon not in records or records[icon]['hash'] != hash_file(icon)]
+    print(f'Recompressing {len(changed)} of {len(icons)} icons')
+
+    # Cached conversions are updated too, or the next convert would restore the unoptimized icon
+    conversion_cache = ConversionCache(paths.conversion_manifest)
+    before = 0
+    after = 0
+    for index, result in enumerate(run_optimizations(changed, workers), start=1):
+        if result.error is not None:
+            print(result.error)
+        if result.after < result.before:
+            conversion_cache.update_output(result.path)
+        before += result.before
+        after += result.after
+        if result.output_hash:
+            records[result.path] = {'before': result.before, 'after': result.after, 'hash': result.output_hash}
+        if index % 50 == 0:
+            print(f'{index} / {len(changed)}')
+    conversion_cache.save()
+
+    report = {'version': OPTIMIZATION_VERSION, 'icons': dict(sorted(records.items()))}
+    temp_path = f'{paths.icon_optimization}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as fp:
+        json.dump(report, fp, indent=1)
+    os.replace(temp_path, paths.icon_optimization)
+    total_before = sum(record['before'] for record in records.values())
+    total_after = sum(record['after'] for record in records.values())
+    print(f'This run: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB')
+    print(f'All recorded icons: {total_before / 1024:.1f} KiB -> {total_after / 1024:.1f} KiB ({total_before - total_after} bytes saved)')
+
+
+if __name__ == '__main__':
+    main(Paths())
@@ -0,0 +1,109 @@
+"""
+Item icon overrides from `data/overrides.json`, compiled once into a per-item lookup.
+"""
+
+from typing import *
+import functools
+import json
+import os
+import re
+
+
+class ItemOverrides(NamedTuple):
+    set: Optional[tuple[str, ...]]
+    """Icons replacing the resolved icons entirely, or None"""
+    add: frozenset[str]
+    """Icons added to the resolved icons"""
+    remove: frozenset[str]
+    """Filename stems removed from the resolved icons"""
+
+
+@functools.lru_cache(maxsize=None)
+def icon_stem(icon_path: str) -> str:
+    return os.path.splitext(os.path.basename(icon_path.replace('\\', '/')))[0]
+
+
+GROUP_REFERENCE = re.compile(r'(?P<reference>\\[1-9]|\(\?P=|\(\?\()|\\.')
+"""Numbered or named backreferences and group conditionals; other escapes are matched so they can be skipped"""
+
+
+def uses_group_references(pattern: str) -> bool:
+    """Whether a pattern refers to its own groups, which would point at the wrong group inside the combined regex"""
+    return any(match.group('reference') for match in GROUP_REFERENCE.finditer(pattern))
+
+
+def compile_patterns(patterns: Iterable[str]) -> Callable[[str], list[int]]:
+    """
+    Returns a function giving the indices of all `patterns` that `re.match` a string.
+    Patterns are tested with a single regex match, each one an optional capturing lookahead from the start.
+    Patterns referring to their own groups are matched one at a time instead.
+    """
+    patterns = list(patterns)
+    separate = [index for index, pattern in enumerate(patterns) if uses_group_references(pattern)]
+    combined_indices = [index for index in range(len(patterns)) if index not in separate]
+    group_names = [f'_override_pattern{index}' for index in combined_indices]
+    try:
+        combined = re.compile(''.join(
+            f'(?:(?=(?P<{group_name}>{patterns[index]})))?' for group_name, index in zip(group_names, combined_indices)
+        ))
+    except re.error:
+        # e.g. two patterns defining the same group name; match them all one at a time
+        separate = list(range(len(patterns)))
+        combined_indices = []
+        combined = re.compile('')
+    group_numbers = [combined.groupindex[group_name] for group_name in group_names[:len(combined_indices)]]
+    compiled = [(index, re.compile(patterns[index])) for index in separate]
+
+    def match_all(string: str) -> list[int]:
+        match = combined.match(string)
+        result = [index for index, group in zip(combined_indices, group_numbers) if match.group(group) is not None]
+        if compiled:
+            result.extend(index for index, pattern in compiled if pattern.match(string))
+            result.sort()
+        return result
+    return match_all
+
+
+class OverrideMatcher:
+    """
+    Answers "which overrides apply to item X" in one lookup. The `pattern_add` and `pattern_remove` regexes are
+    each compiled into a single combined matcher, and the answer for each item is cached.
+    """
+    def __init__(self, overrides: dict[str, dict[str, list[str]]]) -> None:
+        self.set_icons = overrides['set']
+        self.add_icons = overrides['add']
+        self.remove_stems = overrides['remove']
+        self.pattern_add = list(overrides['pattern_add'].values())
+        self.pattern_remove = list(overrides['pattern_remove'].values())
+        self.match_add_patterns = compile_patterns(overrides['pattern_add'])
+        self.match_remove_patterns = compile_patterns(overrides['pattern_remove'])
+        self.cache: dict[str, ItemOverrides] = {}
+
+    @classmethod
+    def from_file(cls, overrides_path: str) -> 'OverrideMatcher':
+        with open(overrides_path, 'r') as fp:
+            return cls(json.load(fp))
+
+    def __getitem__(self, item_name: str) -> ItemOverrides:
+        result = self.cache.get(item_name)
+        if result is None:
+            result = self._build(item_name)
+            self.cache[item_name] = result
+        return result
+
+    def get(self, item_name: str, default: Any = None) -> ItemOverrides:
+        return self[item_name]
+
+    def _build(self, item_name: str) -> ItemOverrides:
+        set_icons = self.set_icons.get(item_name)
+        add = set(self.add_icons.get(item_name, []))
+        for index in self.match_add_patterns(item_name):
+            add.update(self.pattern_add[index])
+        remove = set(self.remove_stems.get(item_name, []))
+        for index in self.match_remove_patterns(item_name):
+            remove.update(self.pattern_remove[index])
+        return ItemOverrides(
+            tuple(set_icons) if set_icons is not None else None,
+            frozenset(add),
+            frozenset(remove),
+        )
@@ -0,0 +1,91 @@
+"""
+On-disk cache of parser output, keyed by the content of the parsed files.
+"""
+
+from typing import *
+import hashlib
+import os
+import pickle
+import zlib
+
+CACHE_DIR = 'build/cache'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.parse'
+
+
+def hash_files(source_paths: Iterable[str], *stamps: str) -> str:
+    digest = hashlib.sha256()
+    for stamp in stamps:
+        digest.update(stamp.encode('utf-8'))
+        digest.update(b'\0')
+    for source_path in source_paths:
+        with open(source_path, 'rb') as fp:
+            while chunk := fp.read(1 << 20):
+                digest.update(chunk)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Stores parser results as compressed pickles under `cache_dir`, one file per key.
+    Entries are touched when read, and the least recently used ones are evicted
+    once the directory grows past `max_bytes`.
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, parser: Callable, source_paths: Iterable[str], version: int) -> str:
+        return hash_files(source_paths, parser.__module__, parser.__qualname__, str(version))
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def load(self, key: str) -> tuple[bool, Any]:
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'rb') as fp:
+                value = pickle.loads(zlib.decompress(fp.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except Exception as ex:
+            # Unreadable or written by an incompatible version; drop it and re-parse
+            print(f'Discarding cache entry {entry_path}: {ex}')
+            os.unlink(entry_path)
+            self.misses += 1
+            return False, None
+        os.utime(entry_path)
+        self.hits += 1
+        return True, value
+
+    def store(self, key: str, value: Any) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_path = self.entry_path(key)
+        temp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as fp:
+            fp.write(zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        os.replace(temp_path, entry_path)
+        self.evict()
+
+    def evict(self) -> list[str]:
+        """Delete least-recently-used entries until the cache fits in `max_bytes`. Returns the deleted paths."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(ENTRY_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort(reverse=True)
+        total = 0
+        evicted = []
+        for _, size, path in entries:
+            total += size
+            if total > self.max_bytes:
+                os.unlink(path)
+                evicted.append(path)
+        return evicted
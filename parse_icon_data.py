@@ -20,8 +20,18 @@ import os
 import re
 from datetime import datetime
 import enum
+import concurrent.futures
 
 from filepaths import Paths
+from gamedata_scanner import ElementScanner
+from parse_cache import ParseCache
+from incremental_resolve import IncrementalResolver, traced
+from override_matcher import OverrideMatcher, icon_stem
+from requirement_graph import RequirementGraph
+
+
+# Bump when a parser's or the resolver's output changes so cached results from older versions are not reused
+PARSER_VERSION = 2
 
 
 class ItemId(NamedTuple):
@@ -54,98 +64,104 @@ class ArrayType(enum.IntEnum):
     WeaponArmour = 4
 
 
+def galaxy_unlock_category(function_name: str, array_type: ArrayType) -> tuple[str, str]:
+    """(race, item category) of a libABFE498B_gf_AP_Triggers_unlock* function"""
+    match = re.match(r'libABFE498B_gf_AP_Triggers_unlock(Zerg|Terran|Protoss)(.*)', function_name)
+    assert match, f'{function_name} is not an unlock function'
+    race = match.group(1).lower()
+    if array_type == ArrayType.Basic:
+        category = (match.group(2)
+            .replace('Units', 'Unit')
+            .replace('Units2', 'Unit2')
+            .replace('Mercenaries', 'Mercenary')
+            .replace('Buildings', 'Building')
+            .replace('Upgrades', 'Upgrade')
+            .replace('Upgrades2', 'Upgrade2')
+            .replace('KerriganAbilities', 'Ability')
+        )
+    elif array_type == ArrayType.Progressive:
+        category = (match.group(2)
+            .replace('ProgressiveUpgrades', 'Progressive')
+            .replace('Upgrades', 'Upgrade')
+        )
+    else:
+        category = 'Upgrade'
+    return race, category
+
+
 def parse_galaxy_file(galaxy_path: str) -> Dict[ItemId, List[GalaxyItem]]:
-    with open(galaxy_path, 'r') as fp:
-        lines = fp.readlines()
+    """
+    Streams the trigger library once. Every line is first checked for a cheap substring
+    (`void `, `process`, `TechTreeUnitAllow`, ...), so a regex only runs on lines that can match it.
+    """
     function_unlocks: dict[str, List[GalaxyItem]] = {}
     function_to_category: dict[str, ItemId] = {}
-    unlocked_times = {}
+    unlocked_times: dict[tuple[str, int | None], int] = {}
     current_function = ''
     bit_array_line = -3
     race = ''
     category = ''
     function_name_pattern = re.compile(r'^void (\w+)')
-    unlock_function_pattern = re.compile(r'libABFE498B_gf_AP_Triggers_unlock(Zerg|Terran|Protoss)(.*)')
     unlock_unit_pattern = re.compile(r'^\s*TechTreeUnitAllow\(lp_player,\s*"(AP_[^"]+)",\s*true\)')
     unlock_upgrade_pattern = re.compile(r'^\s*libNtve_gf_SetUpgradeLevelForPlayer\(lp_player,\s*"(AP_[^"]+)"')
     unlock_ability_pattern = re.compile(r'^\s*TechTreeAbilityAllow\(lp_player,\s*AbilityCommand\("(AP_[^"]+)",\s*(\d+)\),\s*true')
-    UNLOCK_ARRAY_START = 'processBitsInBitArray'
-    UNLOCK_PROGRESSIVE_ARRAY_START = 'ap_triggers_processUpgrades'
-    UNLOCK_WA_UPGRADES_START = 'ap_triggers_processWeaponArmorUpgrades'
+    # All three array starts contain 'process', so most lines are ruled out by one substring check
+    ARRAY_STARTS = (
+        ('processBitsInBitArray', ArrayType.Basic),
+        ('ap_triggers_processUpgrades', ArrayType.Progressive),
+        ('ap_triggers_processWeaponArmorUpgrades', ArrayType.WeaponArmour),
+    )
     array_type = ArrayType.Basic
-    for line_number, line in enumerate(lines, start=1):
-        if match := re.match(function_name_pattern, line):
-            current_function = match.group(1)
-        elif UNLOCK_ARRAY_START in line:
-            array_type = ArrayType.Basic
-            bit_array_line += 1
-            assert current_function
-            match = re.match(unlock_function_pattern, current_function)
-            race = match.group(1).lower()
-            category = (match.group(2)
-                .replace('Units', 'Unit')
-                .replace('Units2', 'Unit2')
-                .replace('Mercenaries', 'Mercenary')
-                .replace('Buildings', 'Building')
-                .replace('Upgrades', 'Upgrade')
-                .replace('Upgrades2', 'Upgrade2')
-                .replace('KerriganAbilities', 'Ability')
-            )
-        elif UNLOCK_PROGRESSIVE_ARRAY_START in line:
-            array_type = ArrayType.Progressive
-            bit_array_line += 1
-            assert current_function
-            match = re.match(unlock_function_pattern, current_function)
-            race = match.group(1).lower()
-            category = (match.group(2)
-                .replace('ProgressiveUpgrades', 'Progressive')
-                .replace('Upgrades', 'Upgrade')
-            )
-        elif UNLOCK_WA_UPGRADES_START in line:
-            array_type = ArrayType.WeaponArmour
-            bit_array_line += 1
-            assert current_function
-            match = re.match(unlock_function_pattern, current_function)
-            assert match
-            race = match.group(1).lower()
-            category = 'Upgrade'
-        elif bit_array_line > -3 and ')' not in line:
-            assert race
-            assert category
-            if bit_array_line >= 0:
-                function_name = line.split('//', 1)[0].strip().split(',', 1)[0]
-                if 'Consumer_sig' not in function_name:
-                    function_to_category[function_name] = ItemId(race, category, bit_array_line)
-                bit_array_line += array_type
-            else:
-                # count through lp_player, lp_bitArrayValue arguments
-                bit_array_line += 1
-        elif bit_array_line > -3:
-            bit_array_line = -3
-            race = ''
-            category = ''
-        elif line.startswith('}'):
-            current_function = ''
-        elif match := re.match(unlock_unit_pattern, line):
-            assert current_function
-            if 'DefaultTech' in current_function: continue
-            function_unlocks.setdefault(current_function, []).append(GalaxyItem('unit', match.group(1)))
-            unlocked_times.setdefault((match.group(1), None), 0)
-            unlocked_times[match.group(1), None] += 1
-        elif match := re.match(unlock_upgrade_pattern, line):
-            if not current_function:
+
+    def add_unlock(unlock: GalaxyItem) -> None:
+        function_unlocks.setdefault(current_function, []).append(unlock)
+        key = (unlock.name, unlock.index)
+        unlocked_times[key] = unlocked_times.get(key, 0) + 1
+
+    with open(galaxy_path, 'r') as fp:
+        for line_number, line in enumerate(fp, start=1):
+            if line.startswith('void ') and (match := function_name_pattern.match(line)):
+                current_function = match.group(1)
                 continue
-            if 'DefaultTech' in current_function: continue
-            function_unlocks.setdefault(current_function, []).append(GalaxyItem('upgrade', match.group(1)))
-            unlocked_times.setdefault((match.group(1), None), 0)
-            unlocked_times[match.group(1), None] += 1
-        elif match := re.match(unlock_ability_pattern, line):
-            assert current_function, f".galaxy line {line_number}"
-            if 'DefaultTech' in current_function: continue
-            abil_index = int(match.group(2))
-            function_unlocks.setdefault(current_function, []).append(GalaxyItem('ability', match.group(1), abil_index))
-            unlocked_times.setdefault((match.group(1), abil_index), 0)
-            unlocked_times[match.group(1), abil_index] += 1
+            if 'process' in line:
+                array_start = next((start_type for needle, start_type in ARRAY_STARTS if needle in line), None)
+                if array_start is not None:
+                    array_type = array_start
+                    bit_array_line += 1
+                    assert current_function, f'.galaxy line {line_number}'
+                    race, category = galaxy_unlock_category(current_function, array_type)
+                    continue
+            if bit_array_line > -3:
+                if ')' in line:
+                    bit_array_line = -3
+                    race = ''
+                    category = ''
+                    continue
+                assert race
+                assert category
+                if bit_array_line >= 0:
+                    function_name = line.split('//', 1)[0].strip().split(',', 1)[0]
+                    if 'Consumer_sig' not in function_name:
+                        function_to_category[function_name] = ItemId(race, category, bit_array_line)
+                    bit_array_line += array_type
+                else:
+                    # count through lp_player, lp_bitArrayValue arguments
+                    bit_array_line += 1
+            elif line.startswith('}'):
+                current_function = ''
+            elif 'TechTreeUnitAllow' in line and (match := unlock_unit_pattern.match(line)):
+                assert current_function, f'.galaxy line {line_number}'
+                if 'DefaultTech' in current_function: continue
+                add_unlock(GalaxyItem('unit', match.group(1)))
+            elif 'SetUpgradeLevelForPlayer' in line and (match := unlock_upgrade_pattern.match(line)):
+                if not current_function:
+                    continue
+                if 'DefaultTech' in current_function: continue
+                add_unlock(GalaxyItem('upgrade', match.group(1)))
+            elif 'TechTreeAbilityAllow' in line and (match := unlock_ability_pattern.match(line)):
+                assert current_function, f'.galaxy line {line_number}'
+                if 'DefaultTech' in current_function: continue
+                add_unlock(GalaxyItem('ability', match.group(1), int(match.group(2))))
     result = {}
     # Multi-unlock overrides
     unlocked_times["AP_HiveMindEmulator", None] = 1
@@ -160,59 +176,62 @@ def parse_galaxy_file(galaxy_path: str) -> Dict[ItemId, List[GalaxyItem]]:
 
 def parse_upgrade_data(upgrade_data_path: str) -> Dict[str, str|None]:
     """upgrade -> icon"""
-    with open(upgrade_data_path, 'r') as fp:
-        lines = fp.readlines()
     result = {}
     current_upgrade = ''
-    upgrade_start_pattern = re.compile(r'^\s*<CUpgrade[^\n]+id="(AP_[^"]+)"')
-    icon_pattern = re.compile(r'^\s*<Icon value="([^"]+)"')
-    for line in lines:
-        if match := re.match(upgrade_start_pattern, line):
-            current_upgrade = match.group(1)
-            assert current_upgrade not in result
-            result[current_upgrade] = None
-        elif match := re.match(icon_pattern, line):
-            current_icon = match.group(1)
-            assert current_upgrade
-            assert result[current_upgrade] is None
-            result[current_upgrade] = current_icon
+    scanner = ElementScanner()
+
+    @scanner.on('CUpgrade*', r'^\s*<CUpgrade[^\n]+id="(AP_[^"]+)"')
+    def upgrade_start(match: re.Match) -> None:
+        nonlocal current_upgrade
+        current_upgrade = match.group(1)
+        assert current_upgrade not in result
+        result[current_upgrade] = None
+
+    @scanner.on('Icon', r'^\s*<Icon value="([^"]+)"')
+    def icon(match: re.Match) -> None:
+        current_icon = match.group(1)
+        assert current_upgrade
+        assert result[current_upgrade] is None
+        result[current_upgrade] = current_icon
+
+    scanner.scan(upgrade_data_path)
     return result
 
 def parse_button_data(button_data_path: str) -> Dict[str, str|None]:
     """button -> icon"""
-    with open(button_data_path, 'r') as fp:
-        lines = fp.readlines()
     result = {}
     current_button = ''
-    button_start_pattern = re.compile(r'^\s*<CButton id="([^"]+)"')
-    icon_pattern = re.compile(r'^\s*<Icon value="([^"]+)"')
-    for line in lines:
-        if match := re.match(button_start_pattern, line):
-            current_button = match.group(1)
-            assert current_button not in result
-            result[current_button] = None
-        elif match := re.match(icon_pattern, line):
-            current_icon = match.group(1)
-            if not current_button:
-                continue
-            assert result[current_button] is None
-            result[current_button] = current_icon
-        elif '</CButton>' in line:
-            current_button = ''
+    scanner = ElementScanner()
+
+    @scanner.on('CButton', r'^\s*<CButton id="([^"]+)"')
+    def button_start(match: re.Match) -> None:
+        nonlocal current_button
+        current_button = match.group(1)
+        assert current_button not in result
+        result[current_button] = None
+
+    @scanner.on('Icon', r'^\s*<Icon value="([^"]+)"')
+    def icon(match: re.Match) -> None:
+        current_icon = match.group(1)
+        if not current_button:
+            return
+        assert result[current_button] is None
+        result[current_button] = current_icon
+
+    @scanner.on('/CButton')
+    def button_end(_) -> None:
+        nonlocal current_button
+        current_button = ''
+
+    scanner.scan(button_data_path)
     return result
 
 def parse_unit_data(unit_data_path: str) -> tuple[dict[str, list[str]], dict[str, set[str]]]:
     """ability -> button, requirement -> button"""
-    with open(unit_data_path, 'r') as fp:
-        lines = fp.readlines()
     ability_to_button: dict[str, list[str]] = {}
     requirement_to_button: dict[str, set[str]] = {}
     last_face = ''
-    command_card_pattern = re.compile(r'^\s*<LayoutButtons.*Face="([^"]+)".*AbilCmd="(AP[^"]+)"')
-    face_pattern = re.compile(r'^\s*<Face value="([^"]+)"/>')
-    abilcmd_pattern = re.compile(r'^\s*<AbilCmd value="(AP_[^"]+)"/>')
-    requirements_pattern = re.compile(r'\s*<Requirements\s*value="(AP_[^"]+)"/>')
-    passive_pattern = re.compile(r'^\s*<LayoutButtons .*Face="([^"]+)".*Requirements="(AP_[^"]+)"')
+    scanner = ElementScanner()
 
     def register_ability(ability_to_button: dict[str, list[str]], ability: str, face: str) -> None:
         ability_to_button.setdefault(ability, [])
@@ -236,263 +255,309 @@ def parse_unit_data(unit_data_path: str) -> tuple[dict[str, list[str]], dict[str
                 if face not in ability_to_button[abil_identifier]:
                     ability_to_button[abil_identifier].append(face)
 
-    for line in lines:
-        if match := re.match(command_card_pattern, line):
-            face = match.group(1)
-            ability = match.group(2)
-            register_ability(ability_to_button, ability, face)
-        elif match := re.match(face_pattern, line):
-            last_face = match.group(1)
-        elif match := re.match(requirements_pattern, line):
-            assert last_face
-            requirement_to_button.setdefault(match.group(1), set()).add(last_face)
-        elif match := re.match(passive_pattern, line):
-            requirement_to_button.setdefault(match.group(2), set()).add(match.group(1))
-        elif match := re.match(abilcmd_pattern, line):
-            if not last_face:
-                continue
-            ability = match.group(1)
-            register_ability(ability_to_button, ability, last_face)
-        elif '</LayoutButtons>' in line:
-            last_face = ''
+    @scanner.on('LayoutButtons*', r'^\s*<LayoutButtons.*Face="([^"]+)".*AbilCmd="(AP[^"]+)"')
+    def command_card(match: re.Match) -> None:
+        face = match.group(1)
+        ability = match.group(2)
+        register_ability(ability_to_button, ability, face)
+
+    @scanner.on('Face', r'^\s*<Face value="([^"]+)"/>')
+    def face(match: re.Match) -> None:
+        nonlocal last_face
+        last_face = match.group(1)
+
+    @scanner.on('Requirements*', r'\s*<Requirements\s*value="(AP_[^"]+)"/>')
+    def requirements(match: re.Match) -> None:
+        assert last_face
+        requirement_to_button.setdefault(match.group(1), set()).add(last_face)
+
+    @scanner.on('LayoutButtons', r'^\s*<LayoutButtons .*Face="([^"]+)".*Requirements="(AP_[^"]+)"')
+    def passive(match: re.Match) -> None:
+        requirement_to_button.setdefault(match.group(2), set()).add(match.group(1))
+
+    @scanner.on('AbilCmd', r'^\s*<AbilCmd value="(AP_[^"]+)"/>')
+    def abilcmd(match: re.Match) -> None:
+        if not last_face:
+            return
+        ability = match.group(1)
+        register_ability(ability_to_button, ability, last_face)
+
+    @scanner.on('/LayoutButtons')
+    def layout_end(_) -> None:
+        nonlocal last_face
+        last_face = ''
+
+    scanner.scan(unit_data_path)
     return (ability_to_button, requirement_to_button)
 
 def parse_behaviour_data(behaviour_data_path: str) -> dict[str, str]:
     """validator -> icon"""
-    with open(behaviour_data_path, 'r') as fp:
-        lines = fp.readlines()
     validator_to_icon: dict[str, str] = {}
-
-    icon_pattern = re.compile(r'^\s*<InfoIcon value="([^"]+)"')
-    behaviour_start_pattern = re.compile(r'^\s*<CBehaviorBuff id="(AP_[^"]+)"')
-    behaviour_end_pattern = re.compile(r'^\s*</CBehaviorBuff>')
-    validator_pattern = re.compile(r'^\s*<DisableValidatorArray value="(AP_[^"]+)"')
-    hidden_pattern = re.compile(r'^\s*<InfoFlags index="Hidden" value="1"/>')
-
     current_behaviour = ''
     current_validator = ''
     current_icon = ''
     hidden = False
-    for line in lines:
-        if match := re.match(behaviour_start_pattern, line):
-            current_behaviour = match.group(1)
-        elif match := re.match(icon_pattern, line):
-            current_icon = match.group(1)
-        elif match := re.match(validator_pattern, line):
-            current_validator = match.group(1)
-        elif match := re.match(hidden_pattern, line):
-            hidden = True
-        elif match := re.match(behaviour_end_pattern, line):
-            if current_behaviour and current_validator and current_icon and not hidden:
-                validator_to_icon[current_validator] = current_icon.lower()
-            current_behaviour = ''
-            current_validator = ''
-            current_icon = ''
-            hidden = False
+    scanner = ElementScanner()
+
+    @scanner.on('CBehaviorBuff', r'^\s*<CBehaviorBuff id="(AP_[^"]+)"')
+    def behaviour_start(match: re.Match) -> None:
+        nonlocal current_behaviour
+        current_behaviour = match.group(1)
+
+    @scanner.on('InfoIcon', r'^\s*<InfoIcon value="([^"]+)"')
+    def icon(match: re.Match) -> None:
+        nonlocal current_icon
+        current_icon = match.group(1)
+
+    @scanner.on('DisableValidatorArray', r'^\s*<DisableValidatorArray value="(AP_[^"]+)"')
+    def validator(match: re.Match) -> None:
+        nonlocal current_validator
+        current_validator = match.group(1)
+
+    @scanner.on('InfoFlags', r'^\s*<InfoFlags index="Hidden" value="1"/>')
+    def info_hidden(_) -> None:
+        nonlocal hidden
+        hidden = True
+
+    @scanner.on('/CBehaviorBuff', r'^\s*</CBehaviorBuff>')
+    def behaviour_end(_) -> None:
+        nonlocal current_behaviour, current_validator, current_icon, hidden
+        if current_behaviour and current_validator and current_icon and not hidden:
+            validator_to_icon[current_validator] = current_icon.lower()
+        current_behaviour = ''
+        current_validator = ''
+        current_icon = ''
+        hidden = False
+
+    scanner.scan(behaviour_data_path)
     return validator_to_icon
 
 def parse_validator_data(validator_data_path: str) -> dict[str, str]:
     """requirement -> validator"""
-    with open(validator_data_path, 'r') as fp:
-        lines = fp.readlines()
     requirement_to_validator: dict[str, str] = {}
-    validator_start_pattern = re.compile(r'^\s*<CValidatorPlayerRequirement id="(AP_[^"]+)"')
-    validator_end_pattern = re.compile(r'^\s*</CValidatorPlayerRequirement>')
-    requirement_pattern = re.compile(r'^\s*<Value value="(AP_[^"]+)"')
-    is_positive_pattern = re.compile(r'^\s*<Find value="1"/>')
-
     current_validator = ''
     current_requirement = ''
     is_positive = False
-    for line in lines:
-        if match := re.match(validator_start_pattern, line):
-            if match.group(1) != 'AP_HaveKerriganPrimalRage':
-                current_validator = match.group(1)
-        elif match := re.match(requirement_pattern, line):
-            if not current_validator: continue
-            current_requirement = match.group(1)
-        elif match := re.match(is_positive_pattern, line):
-            is_positive = True
-        elif match := re.match(validator_end_pattern, line):
-            if current_requirement and current_validator and is_positive:
-                assert current_requirement not in requirement_to_validator
-                requirement_to_validator[current_requirement] = current_validator
-            current_validator = ''
-            current_requirement = ''
-            is_positive = False
+    scanner = ElementScanner()
+
+    @scanner.on('CValidatorPlayerRequirement', r'^\s*<CValidatorPlayerRequirement id="(AP_[^"]+)"')
+    def validator_start(match: re.Match) -> None:
+        nonlocal current_validator
+        if match.group(1) != 'AP_HaveKerriganPrimalRage':
+            current_validator = match.group(1)
+
+    @scanner.on('Value', r'^\s*<Value value="(AP_[^"]+)"')
+    def requirement(match: re.Match) -> None:
+        nonlocal current_requirement
+        if not current_validator: return
+        current_requirement = match.group(1)
+
+    @scanner.on('Find', r'^\s*<Find value="1"/>')
+    def positive(_) -> None:
+        nonlocal is_positive
+        is_positive = True
+
+    @scanner.on('/CValidatorPlayerRequirement', r'^\s*</CValidatorPlayerRequirement>')
+    def validator_end(_) -> None:
+        nonlocal current_validator, current_requirement, is_positive
+        if current_requirement and current_validator and is_positive:
+            assert current_requirement not in requirement_to_validator
+            requirement_to_validator[current_requirement] = current_validator
+        current_validator = ''
+        current_requirement = ''
+        is_positive = False
+
+    scanner.scan(validator_data_path)
     return requirement_to_validator
 
 
 def parse_abil_data(abil_data_path: str) -> tuple[dict[str, list[str]], dict[str, list[str]], dict[str, list[str]]]:
     """unit -> ability (train), requirement -> button, requirement -> ability"""
-    with open(abil_data_path, 'r') as fp:
-        lines = fp.readlines()
     unit_to_ability: dict[str, list[str]] = {}
     requirement_to_button: dict[str, list[str]] = {}
     requirement_to_ability: dict[str, list[str]] = {}
     current_ability_stem = ''
     current_ability_type = ''
     current_ability_index = 0
-
-    train_start_pattern = re.compile(r'^\s*<CAbil(?:Warp)?Train\s+id="(AP_[^"]+)">')
-    build_start_pattern = re.compile(r'^\s*<CAbilBuild\s+id="(AP_[^"]+)"')
-    other_abil_start_pattern = re.compile(r'^\s*<CAbil\w+\s+id="(AP_[^"]+)"[^/]+$')
-    index_start_pattern = re.compile(r'^\s*<InfoArray\s+index="(Build|Train)(\d+)"(?:\s+Unit="(AP_[^"]+)")?')
-    button_pattern = re.compile(r'^\s*<CmdButtonArray (?:index="([^"]+)" )?.*(?:DefaultButtonFace="([^"]+)" )?.*Requirements="(AP_[^"]+)"')
-    abil_end_pattern = re.compile(r'^\s*</CAbil(\w+)>')
-    unit_pattern = re.compile(r'^\s*<Unit value="(AP_[^"]+)"/>')
-    default_button_pattern = re.compile(r'^\s*<Button DefaultButtonFace="(AP_[^"]+)" .*Requirements="(AP_[^"]+)"')
-    for line_number, line in enumerate(lines):
-        if match := re.match(train_start_pattern, line):
-            assert not current_ability_type, f"Error on line {line_number}: '{line}'"
-            assert not current_ability_stem, f"Error on line {line_number}: '{line}'"
-            current_ability_index = 0
-            current_ability_stem = match.group(1)
-            current_ability_type = 'train'
-        elif match := re.match(build_start_pattern, line):
-            assert not current_ability_type
-            assert not current_ability_stem
-            current_ability_index = 0
-            current_ability_stem = match.group(1)
-            current_ability_type = 'build'
-        elif match := re.match(other_abil_start_pattern, line):
-            assert not current_ability_type
-            assert not current_ability_stem
-            current_ability_index = 0
-            current_ability_stem = match.group(1)
-            current_ability_type = 'other'
-        elif match := re.match(index_start_pattern, line):
-            assert current_ability_stem
-            assert current_ability_type
-            if current_ability_type == 'build':
-                assert match.group(1) == 'Build'
-                if match.group(3) is None:
-                    continue
-                unit = match.group(3)
-                unit_to_ability.setdefault(unit, [])
-                ability = f'{current_ability_stem},{int(match.group(2)) - 1}'
-                ability_long = f'{current_ability_stem},{match.group(1)}{match.group(2)}'
-                if ability in unit_to_ability[unit]:
-                    continue
-                unit_to_ability[unit].append(ability)
-                unit_to_ability[unit].append(ability_long)
-            elif current_ability_type == 'train':
-                current_ability_index = int(match.group(2)) - 1
-            # Note(mm): not handling info arrays for 'other' abilities
-        elif match := re.match(button_pattern, line):
-            assert match.group(1) or match.group(2)
-            if match.group(2):
-                requirement_to_button.setdefault(match.group(3), []).append(match.group(2))
-            if match.group(1):
-                if not current_ability_stem: continue
-                assert current_ability_type == 'other'
-                requirement_to_ability.setdefault(match.group(3), []).extend([
-                    f'{current_ability_stem},{match.group(1)}',
-                    f'{current_ability_stem},{current_ability_index}',
-                ])
-                current_ability_index += 1
-        elif match := re.match(default_button_pattern, line):
-            requirement_to_button.setdefault(match.group(2), []).append(match.group(1))
-        elif '</InfoArray>' in line and current_ability_type == 'train':
-            current_ability_index = -1
-        elif match := re.match(unit_pattern, line):
-            assert current_ability_type == 'train'
-            assert current_ability_stem
-            unit_to_ability.setdefault(match.group(1), [])
-            assert current_ability_index >= 0
-            ability = f'{current_ability_stem},{current_ability_index}'
-            ability_long = f'{current_ability_stem},Train{current_ability_index+1}'
-            if ability in unit_to_ability[match.group(1)]:
-                # Mercs, zerglings, scourge
-                continue
-            unit_to_ability[match.group(1)].append(ability)
-            unit_to_ability[match.group(1)].append(ability_long)
-        elif match := re.match(abil_end_pattern, line):
-            current_ability_type = ''
-            current_ability_stem = ''
-            current_ability_index = 0
+    scanner = ElementScanner()
+
+    def start_ability(stem: str, ability_type: str) -> None:
+        nonlocal current_ability_stem, current_ability_type, current_ability_index
+        assert not current_ability_type
+        assert not current_ability_stem
+        current_ability_index = 0
+        current_ability_stem = stem
+        current_ability_type = ability_type
+
+    @scanner.on('CAbil*', r'^\s*<CAbil(?:Warp)?Train\s+id="(AP_[^"]+)">')
+    def train_start(match: re.Match) -> None:
+        start_ability(match.group(1), 'train')
+
+    @scanner.on('CAbil*', r'^\s*<CAbilBuild\s+id="(AP_[^"]+)"')
+    def build_start(match: re.Match) -> None:
+        start_ability(match.group(1), 'build')
+
+    @scanner.on('CAbil*', r'^\s*<CAbil\w+\s+id="(AP_[^"]+)"[^/]+$')
+    def other_abil_start(match: re.Match) -> None:
+        start_ability(match.group(1), 'other')
+
+    @scanner.on('InfoArray', r'^\s*<InfoArray\s+index="(Build|Train)(\d+)"(?:\s+Unit="(AP_[^"]+)")?')
+    def index_start(match: re.Match) -> None:
+        nonlocal current_ability_index
+        assert current_ability_stem
+        assert current_ability_type
+        if current_ability_type == 'build':
+            assert match.group(1) == 'Build'
+            if match.group(3) is None:
+                return
+            unit = match.group(3)
+            unit_to_ability.setdefault(unit, [])
+            ability = f'{current_ability_stem},{int(match.group(2)) - 1}'
+            ability_long = f'{current_ability_stem},{match.group(1)}{match.group(2)}'
+            if ability in unit_to_ability[unit]:
+                return
+            unit_to_ability[unit].append(ability)
+            unit_to_ability[unit].append(ability_long)
+        elif current_ability_type == 'train':
+            current_ability_index = int(match.group(2)) - 1
+        # Note(mm): not handling info arrays for 'other' abilities
+
+    @scanner.on('CmdButtonArray', r'^\s*<CmdButtonArray (?:index="([^"]+)" )?.*(?:DefaultButtonFace="([^"]+)" )?.*Requirements="(AP_[^"]+)"')
+    def button(match: re.Match) -> None:
+        nonlocal current_ability_index
+        assert match.group(1) or match.group(2)
+        if match.group(2):
+            requirement_to_button.setdefault(match.group(3), []).append(match.group(2))
+        if match.group(1):
+            if not current_ability_stem: return
+            assert current_ability_type == 'other'
+            requirement_to_ability.setdefault(match.group(3), []).extend([
+                f'{current_ability_stem},{match.group(1)}',
+                f'{current_ability_stem},{current_ability_index}',
+            ])
+            current_ability_index += 1
+
+    @scanner.on('Button', r'^\s*<Button DefaultButtonFace="(AP_[^"]+)" .*Requirements="(AP_[^"]+)"')
+    def default_button(match: re.Match) -> None:
+        requirement_to_button.setdefault(match.group(2), []).append(match.group(1))
+
+    @scanner.on('/InfoArray')
+    def info_array_end(_) -> bool:
+        nonlocal current_ability_index
+        if current_ability_type != 'train':
+            return False
+        current_ability_index = -1
+        return True
+
+    @scanner.on('Unit', r'^\s*<Unit value="(AP_[^"]+)"/>')
+    def unit(match: re.Match) -> None:
+        assert current_ability_type == 'train'
+        assert current_ability_stem
+        unit_to_ability.setdefault(match.group(1), [])
+        assert current_ability_index >= 0
+        ability = f'{current_ability_stem},{current_ability_index}'
+        ability_long = f'{current_ability_stem},Train{current_ability_index+1}'
+        if ability in unit_to_ability[match.group(1)]:
+            # Mercs, zerglings, scourge
+            return
+        unit_to_ability[match.group(1)].append(ability)
+        unit_to_ability[match.group(1)].append(ability_long)
+
+    @scanner.on('/CAbil*', r'^\s*</CAbil(\w+)>')
+    def abil_end(_) -> None:
+        nonlocal current_ability_stem, current_ability_type, current_ability_index
+        current_ability_type = ''
+        current_ability_stem = ''
+        current_ability_index = 0
+
+    scanner.scan(abil_data_path)
     return unit_to_ability, requirement_to_button, requirement_to_ability
 
 def parse_requirement_data(requirement_data_path: str) -> dict[str, List[str]]:
     """requirement -> requirement_node"""
-    with open(requirement_data_path, 'r') as fp:
-        lines = fp.readlines()
     requirement_to_node: dict[str, str] = {}
     current_req = ''
-    requirement_start_pattern = re.compile(r'^\s*<CRequirement\s+id="(AP_[^"]+)">')
-    node_pattern = re.compile(r'^\s*<NodeArray.*Link="(AP_[^"]+)"')
-    for line in lines:
-        if match := re.match(requirement_start_pattern, line):
-            current_req = match.group(1)
-        elif match := re.match(node_pattern, line):
-            if not current_req:
-                continue
-            requirement_to_node.setdefault(current_req, [])
-            if match.group(1) not in requirement_to_node[current_req]:
-                requirement_to_node[current_req].append(match.group(1))
-        elif '</CRequirement>' in line:
-            current_req = ''
+    scanner = ElementScanner()
+
+    @scanner.on('CRequirement', r'^\s*<CRequirement\s+id="(AP_[^"]+)">')
+    def requirement_start(match: re.Match) -> None:
+        nonlocal current_req
+        current_req = match.group(1)
+
+    @scanner.on('NodeArray*', r'^\s*<NodeArray.*Link="(AP_[^"]+)"')
+    def node(match: re.Match) -> None:
+        if not current_req:
+            return
+        requirement_to_node.setdefault(current_req, [])
+        if match.group(1) not in requirement_to_node[current_req]:
+            requirement_to_node[current_req].append(match.group(1))
+
+    @scanner.on('/CRequirement')
+    def requirement_end(_) -> None:
+        nonlocal current_req
+        current_req = ''
+
+    scanner.scan(requirement_data_path)
     return requirement_to_node
 
 def parse_combined_requirement_data(requirement_data_path: str, requirement_node_data_path: str) -> dict[str, str]:
     """upgrade -> requirement"""
-    with open(requirement_node_data_path, 'r') as fp:
-        lines = fp.readlines()
     requirement_node_to_upgrade: dict[str, str] = {}
     requirement_node_interlink: dict[str, List[str]] = {}
     UPGRADE = 'upgrade'
     current_requirement = ()
-
-    upgrade_start_pattern = re.compile(r'^\s*<CRequirementCountUpgrade\s+id="(AP_[^"]+)">')
-    other_requirement_start_pattern = re.compile(r'^\s*<(CRequirement\w+)\s+id="(AP_[^"]+)"[^/]+$')
-    count_pattern = re.compile(r'^\s*<Count Link="(AP_[^"]+)" State="CompleteOnly"')
-    operand_pattern = re.compile(r'^\s*<OperandArray .*value="(AP_[^"]+)"')
-    upgrade_end_pattern = re.compile(r'^\s*</CRequirementCountUpgrade>')
-    other_req_end_pattern = re.compile(r'^\s*</(CRequirement\w+)>')
-    for line_number, line in enumerate(lines):
-        if match := re.match(upgrade_start_pattern, line):
-            assert not current_requirement
-            current_requirement = (match.group(1), UPGRADE)
-        elif match := re.match(upgrade_end_pattern, line):
-            if current_requirement: assert current_requirement[1] == UPGRADE
-            current_requirement = ()
-        elif match := re.match(other_requirement_start_pattern, line):
-            assert not current_requirement
-            current_requirement = (match.group(2), match.group(1))
-        elif match := re.match(other_req_end_pattern, line):
-            if current_requirement: assert current_requirement[1] == match.group(1)
-            current_requirement = ()
-        elif match := re.match(count_pattern, line):
-            assert current_requirement, f'Error on line {line_number}: found count outside requirement'
-            if current_requirement[1] != UPGRADE:
-                continue
-            assert current_requirement[0] not in requirement_node_to_upgrade, f"{current_requirement[0]} is already associated with an upgrade"
-            requirement_node_to_upgrade[current_requirement[0]] = match.group(1)
-        elif match := re.match(operand_pattern, line):
-            assert current_requirement
-            assert current_requirement[1] != UPGRADE
-            requirement_node_interlink.setdefault(current_requirement[0], []).append(match.group(1))
+    scanner = ElementScanner()
+
+    @scanner.on('CRequirementCountUpgrade', r'^\s*<CRequirementCountUpgrade\s+id="(AP_[^"]+)">')
+    def upgrade_start(match: re.Match) -> None:
+        nonlocal current_requirement
+        assert not current_requirement
+        current_requirement = (match.group(1), UPGRADE)
+
+    @scanner.on('/CRequirementCountUpgrade', r'^\s*</CRequirementCountUpgrade>')
+    def upgrade_end(_) -> None:
+        nonlocal current_requirement
+        if current_requirement: assert current_requirement[1] == UPGRADE
+        current_requirement = ()
+
+    @scanner.on('CRequirement*', r'^\s*<(CRequirement\w+)\s+id="(AP_[^"]+)"[^/]+$')
+    def other_requirement_start(match: re.Match) -> None:
+        nonlocal current_requirement
+        assert not current_requirement
+        current_requirement = (match.group(2), match.group(1))
+
+    @scanner.on('/CRequirement*', r'^\s*</(CRequirement\w+)>')
+    def other_requirement_end(match: re.Match) -> None:
+        nonlocal current_requirement
+        if current_requirement: assert current_requirement[1] == match.group(1)
+        current_requirement = ()
+
+    @scanner.on('Count', r'^\s*<Count Link="(AP_[^"]+)" State="CompleteOnly"')
+    def count(match: re.Match) -> None:
+        assert current_requirement, 'found count outside requirement'
+        if current_requirement[1] != UPGRADE:
+            return
+        assert current_requirement[0] not in requirement_node_to_upgrade, f"{current_requirement[0]} is already associated with an upgrade"
+        requirement_node_to_upgrade[current_requirement[0]] = match.group(1)
+
+    @scanner.on('OperandArray', r'^\s*<OperandArray .*value="(AP_[^"]+)"')
+    def operand(match: re.Match) -> None:
+        assert current_requirement
+        assert current_requirement[1] != UPGRADE
+        requirement_node_interlink.setdefault(current_requirement[0], []).append(match.group(1))
+
+    scanner.scan(requirement_node_data_path)
     requirement_to_node = parse_requirement_data(requirement_data_path)
+    start_nodes = {node for nodes in requirement_to_node.values() for node in nodes}
+    # Only reachability from requirement start nodes to upgrade count nodes is needed, so closures are kept to those
+    graph = RequirementGraph(requirement_node_interlink, targets=requirement_node_to_upgrade, starts=start_nodes)
     upgrade_to_requirement: dict[str, set[str]] = {}
-    for requirement, start_nodes in requirement_to_node.items():
-        nodes = set()
-        for node in start_nodes:
-            nodes.update(accessible_nodes(node, requirement_node_interlink))
-        nodes = sorted(nodes)
-        for node in nodes:
-            upgrade = requirement_node_to_upgrade.get(node)
-            if upgrade is not None:
-                upgrade_to_requirement.setdefault(upgrade, set()).add(requirement)
+    for requirement, nodes in requirement_to_node.items():
+        for node in graph.reachable_names(nodes):
+            upgrade_to_requirement.setdefault(requirement_node_to_upgrade[node], set()).add(requirement)
 
     return {upgrade: sorted(reqs) for upgrade, reqs in upgrade_to_requirement.items()}
 
-def accessible_nodes(start: str, map: dict[str, list[str]]) -> list[str]:
-    result = set([start])
-    descendants = map.get(start, [])
-    for descendant in descendants:
-        result.update(accessible_nodes(descendant, map))
-    return result
-
 def resolve_item_icon(
     item_name: str,
     item_numbers: dict[str, ItemId],
@@ -506,17 +571,14 @@ def resolve_item_icon(
     upgrade_to_requirement: dict[str, list[str]],
     requirement_to_validator: dict[str, str],
     validator_to_icon: dict[str, str],
-    overrides: dict,
+    overrides: OverrideMatcher,
 ) -> list[str]:
     result: set[str] = set()
     item = item_numbers[item_name]
-    if item_name in overrides['set']:
-        return overrides['set'][item_name]
-    if item_name in overrides['add']:
-        result.update(overrides['add'][item_name])
-    for pattern in overrides['pattern_add']:
-        if re.match(pattern, item_name):
-            result.update(overrides['pattern_add'][pattern])
+    item_overrides = overrides[item_name]
+    if item_overrides.set is not None:
+        return list(item_overrides.set)
+    result.update(item_overrides.add)
     unlocks = id_to_unlocks.get(item, [])
     for unlock in unlocks:
         if unlock.galaxy_type == 'unit':
@@ -567,46 +629,95 @@ def resolve_item_icon(
                 icon = button_to_icon.get(button)
                 if icon:
                     result.add(icon.lower())
-    removals = overrides['remove'].get(item_name, [])
-    for pattern in overrides['pattern_remove']:
-        if re.match(pattern, item_name):
-            removals = removals + overrides['pattern_remove'][pattern]
     return [
         x.replace('&apos;', "'")
         for x in sorted(result)
-        if os.path.splitext(os.path.basename(x.replace('\\', '/')))[0] not in removals
+        if icon_stem(x) not in item_overrides.remove
     ]
 
 
-def main(paths: Paths):
-    with open(paths.workspace, 'r') as fp:
-        config = json.load(fp)
+class ParseJob(NamedTuple):
+    parser: Callable
+    source_paths: tuple[str, ...]
+
+
+def get_parse_jobs(config: dict) -> dict[str, ParseJob]:
     game_data = os.path.join(config['mod_files'], 'Mods/ArchipelagoPlayer.SC2Mod/Base.SC2Data/GameData')
     liberty_game_data = config.get('liberty_game_data')
+    jobs = {
+        'upgrade_data': ParseJob(parse_upgrade_data, (os.path.join(game_data, 'UpgradeData.xml'),)),
+        'button_data': ParseJob(parse_button_data, (os.path.join(game_data, 'ButtonData.xml'),)),
+        'galaxy': ParseJob(parse_galaxy_file, (os.path.join(config['mod_files'], 'Mods/ArchipelagoTriggers.SC2Mod/Base.SC2Data/LibABFE498B.galaxy'),)),
+        'abil_data': ParseJob(parse_abil_data, (os.path.join(game_data, 'AbilData.xml'),)),
+        'unit_data': ParseJob(parse_unit_data, (os.path.join(game_data, 'UnitData.xml'),)),
+        'requirement_data': ParseJob(parse_combined_requirement_data, (os.path.join(game_data, 'RequirementData.xml'), os.path.join(game_data, 'RequirementNodeData.xml'))),
+        'behaviour_data': ParseJob(parse_behaviour_data, (os.path.join(game_data, 'BehaviorData.xml'),)),
+        'validator_data': ParseJob(parse_validator_data, (os.path.join(game_data, 'ValidatorData.xml'),)),
+    }
+    if liberty_game_data:
+        jobs['vanilla_button_data'] = ParseJob(parse_button_data, (os.path.join(liberty_game_data, 'buttondata.xml'),))
+    return jobs
+
+
+def run_parse_jobs(jobs: dict[str, ParseJob], workers: int = 1, cache: ParseCache | None = None) -> dict[str, Any]:
+    """
+    Run every parse job, either serially or spread over a process pool of `workers` processes.
+    Results are always returned in job order, so downstream output is identical to a serial run.
+    Jobs whose source files are unchanged since a previous run are loaded from `cache` instead.
+    """
+    results: dict[str, Any] = {}
+    keys: dict[str, str] = {}
+    if cache is not None:
+        for name, job in jobs.items():
+            keys[name] = cache.key(job.parser, job.source_paths, PARSER_VERSION)
+            hit, value = cache.load(keys[name])
+            if hit:
+                results[name] = value
+    pending = [name for name in jobs if name not in results]
+    if workers <= 1 or len(pending) <= 1:
+        for name in pending:
+            results[name] = jobs[name].parser(*jobs[name].source_paths)
+    else:
+        # Submit the biggest inputs first so the slowest parse starts as early as possible
+        by_size = sorted(pending, key=lambda name: -sum(os.path.getsize(path) for path in jobs[name].source_paths))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            futures = {name: executor.submit(jobs[name].parser, *jobs[name].source_paths) for name in by_size}
+            for name in pending:
+                results[name] = futures[name].result()
+    if cache is not None:
+        for name in pending:
+            cache.store(keys[name], results[name])
+        print(f'Parse cache: {cache.hits} hit(s), {cache.misses} miss(es)')
+    return {name: results[name] for name in jobs}
+
+
+def load_game_data(paths: Paths, workers: int = 1, use_cache: bool = True) -> dict[str, Any]:
+    """Parse the mod files into the maps `resolve_item_icon` joins; these do not depend on item data"""
+    with open(paths.workspace, 'r') as fp:
+        config = json.load(fp)
 
-    with open(paths.overrides, 'r') as fp:
-        overrides: dict = json.load(fp)
+    cache = ParseCache(paths.parse_cache) if use_cache else None
+    return combine_parse_results(run_parse_jobs(get_parse_jobs(config), workers, cache))
 
-    item_data = get_item_data(paths)
-    item_numbers = get_item_numbers(item_data)
-    upgrade_to_icon = parse_upgrade_data(os.path.join(game_data, 'UpgradeData.xml'))
-    button_to_icon = parse_button_data(os.path.join(game_data, 'ButtonData.xml'))
-    if liberty_game_data:
-        vanilla_button_icons = parse_button_data(os.path.join(liberty_game_data, 'buttondata.xml'))
-        button_to_icon.update(vanilla_button_icons)
-    id_to_unlocks = parse_galaxy_file(os.path.join(config['mod_files'], 'Mods/ArchipelagoTriggers.SC2Mod/Base.SC2Data/LibABFE498B.galaxy'))
-    unit_to_ability, requirement_to_ability_button, requirement_to_ability = parse_abil_data(os.path.join(game_data, 'AbilData.xml'))
-    ability_to_button, requirement_to_button = parse_unit_data(os.path.join(game_data, 'UnitData.xml'))
-    upgrade_to_requirement = parse_combined_requirement_data(os.path.join(game_data, 'RequirementData.xml'), os.path.join(game_data, 'RequirementNodeData.xml'))
-    validator_to_icon = parse_behaviour_data(os.path.join(game_data, 'BehaviorData.xml'))
-    requirement_to_validator = parse_validator_data(os.path.join(game_data, 'ValidatorData.xml'))
+
+def combine_parse_results(parsed: dict[str, Any]) -> dict[str, Any]:
+    """Joins the results of `get_parse_jobs` into the maps `resolve_item_icon` takes"""
+    upgrade_to_icon = parsed['upgrade_data']
+    button_to_icon = parsed['button_data']
+    if 'vanilla_button_data' in parsed:
+        button_to_icon.update(parsed['vanilla_button_data'])
+    id_to_unlocks = parsed['galaxy']
+    unit_to_ability, requirement_to_ability_button, requirement_to_ability = parsed['abil_data']
+    ability_to_button, requirement_to_button = parsed['unit_data']
+    upgrade_to_requirement = parsed['requirement_data']
+    validator_to_icon = parsed['behaviour_data']
+    requirement_to_validator = parsed['validator_data']
 
     for req, buttons in requirement_to_ability_button.items():
         requirement_to_button.setdefault(req, set()).update(buttons)
     upgrade_to_icon = {key: value for key, value in upgrade_to_icon.items() if value is not None}
     button_to_icon = {key: value for key, value in button_to_icon.items() if value is not None}
-    kwargs = {
-        'item_numbers': item_numbers,
+    return {
         'id_to_unlocks': id_to_unlocks,
         'unit_to_ability': unit_to_ability,
         'ability_to_button': ability_to_button,
@@ -617,16 +728,61 @@ def main(paths: Paths):
         'upgrade_to_requirement': upgrade_to_requirement,
         'requirement_to_validator': requirement_to_validator,
         'validator_to_icon': validator_to_icon,
-        'overrides': overrides,
     }
 
-    found = 0
-    locations = {}
-    icon_paths = resolve_item_icon('Burrow Charge (Ultralisk)', **kwargs)
-    for item_name in item_numbers:
-        icon_paths = resolve_item_icon(item_name, **kwargs)
-        if icon_paths: found += 1
-        locations[item_name] = icon_paths
+
+def load_resolve_inputs(paths: Paths, workers: int = 1, use_cache: bool = True) -> dict[str, Any]:
+    """Parse everything `resolve_item_icon` needs, returned as its keyword arguments"""
+    return {
+        'item_numbers': get_item_numbers(get_item_data(paths)),
+        **load_game_data(paths, workers, use_cache),
+        'overrides': OverrideMatcher.from_file(paths.overrides),
+    }
+
+
+def main(paths: Paths, workers: int = 1, use_cache: bool = True) -> list[str]:
+    """Writes item icon locations and returns the names of items whose icons changed since the last cached run"""
+    return main_builds([paths], workers, use_cache)[paths.icon_paths]
+
+
+def main_builds(builds: Sequence[Paths], workers: int = 1, use_cache: bool = True) -> dict[str, list[str]]:
+    """
+    Writes item icon locations for several item data files (e.g. stable and beta) against the same mod files.
+    The mod files are parsed once, from the first build's workspace.
+    Returns the changed item names for each build's `icon_paths`.
+    """
+    game_data = load_game_data(builds[0], workers, use_cache)
+    return {paths.icon_paths: write_locations(paths, game_data, use_cache) for paths in builds}
+
+
+def locations_match(icon_paths: str, locations: dict[str, list[str]]) -> bool:
+    """Whether the locations file on disk holds `locations`; it may have been edited or replaced since the last run"""
+    try:
+        with open(icon_paths, 'r') as fp:
+            return json.load(fp).get('locations') == locations
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def write_locations(paths: Paths, game_data: dict[str, Any], use_cache: bool = True) -> list[str]:
+    item_numbers = get_item_numbers(get_item_data(paths))
+    overrides = OverrideMatcher.from_file(paths.overrides)
+    kwargs = {'item_numbers': item_numbers, **game_data, 'overrides': overrides}
+    if use_cache:
+        state_path = os.path.join(paths.parse_cache, f'resolve.{os.path.basename(paths.icon_paths)}.pickle')
+        resolver = IncrementalResolver(traced(resolve_item_icon, kwargs), state_path, PARSER_VERSION)
+        locations, changed = resolver.resolve_all(item_numbers, kwargs)
+        print(f'Changed: {len(changed)} item(s)')
+        for item_name in changed:
+            print(f'  {item_name}')
+    else:
+        locations = {item_name: resolve_item_icon(item_name, **kwargs) for item_name in item_numbers}
+        changed = list(locations)
+    found = sum(1 for icon_paths in locations.values() if icon_paths)
+    print(f'Found {found} / {len(item_numbers)}')
+    if not changed and locations_match(paths.icon_paths, locations):
+        print(f'{paths.icon_paths} is up to date')
+        return changed
     result = {
         'meta': {
             'timestamp': datetime.now().strftime('%Y-%m-%d'),
@@ -635,10 +791,11 @@ def main(paths: Paths):
         },
         'locations': locations,
     }
-    print(f'Found {found} / {len(item_numbers)}')
     with open(paths.icon_paths, 'w') as fp:
         json.dump(result, fp, indent=2)
+    return changed
 
 if __name__ == '__main__':
-    main(Paths())
+    import sys
+    main(Paths(), workers=int(sys.argv[1]) if len(sys.argv) > 1 else 1)
     
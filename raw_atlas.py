@@ -0,0 +1,91 @@
+"""
+Uncompressed atlas pages that can be memory-mapped and uploaded without decoding.
+
+A raw page is a 64 byte header followed by rows of 8-bit RGBA pixels, top to bottom. The PNG pages stay the canonical
+artifact; raw pages are written next to them with a `.rgba` extension.
+
+Header, little-endian:
+    8s  magic `SC2RGBA\\0`
+    I   version
+    I   header size; pixel data starts here
+    I   width
+    I   height
+    I   stride in bytes
+    I   format, FORMAT_RGBA8 or FORMAT_RGBA8_PREMULTIPLIED
+    Q   size of the pixel data in bytes
+    I   CRC-32 of the pixel data
+    then zero padding up to the header size
+"""
+
+from typing import *
+import mmap
+import os
+import struct
+import zlib
+
+from png_codec import RGBAImage
+
+RAW_MAGIC = b'SC2RGBA\0'
+RAW_VERSION = 1
+RAW_HEADER_SIZE = 64
+HEADER = struct.Struct('<8sIIIIIIQI')
+FORMAT_RGBA8 = 1
+FORMAT_RGBA8_PREMULTIPLIED = 2
+
+
+class RawHeader(NamedTuple):
+    width: int
+    height: int
+    stride: int
+    format: int
+    data_size: int
+    checksum: int
+
+
+def raw_path(png_path: str) -> str:
+    return os.path.splitext(png_path)[0] + '.rgba'
+
+
+def premultiply(pixels: bytes) -> bytes:
+    if pixels[3::4].count(255) == len(pixels) // 4:
+        return pixels
+    result = bytearray(pixels)
+    for offset in range(0, len(result), 4):
+        alpha = result[offset + 3]
+        if alpha != 255:
+            for channel in range(offset, offset + 3):
+                result[channel] = (result[channel] * alpha + 127) // 255
+    return bytes(result)
+
+
+def write_raw(path: str, image: RGBAImage, premultiplied: bool = False) -> None:
+    pixels = premultiply(image.pixels) if premultiplied else image.pixels
+    pixel_format = FORMAT_RGBA8_PREMULTIPLIED if premultiplied else FORMAT_RGBA8
+    header = HEADER.pack(
+        RAW_MAGIC, RAW_VERSION, RAW_HEADER_SIZE, image.width, image.height, image.width * 4, pixel_format,
+        len(pixels), zlib.crc32(pixels),
+    )
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as fp:
+        fp.write(header.ljust(RAW_HEADER_SIZE, b'\0'))
+        fp.write(pixels)
+    os.replace(temp_path, path)
+
+
+def read_raw(path: str, verify: bool = False) -> tuple[RawHeader, memoryview]:
+    """
+    Memory-maps a raw page, returning its header and a read-only view of its pixel data.
+    With `verify`, the checksum is checked, which reads the whole file.
+    """
+    with open(path, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size, *fields = HEADER.unpack_from(data)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise ValueError(f'{path} is not a version {RAW_VERSION} raw atlas page')
+    header = RawHeader(*fields)
+    if len(data) < header_size + header.data_size:
+        raise ValueError(f'{path} is truncated')
+    pixels = memoryview(data)[header_size:header_size + header.data_size]
+    if verify and zlib.crc32(pixels) != header.checksum:
+        raise ValueError(f'{path} failed its checksum')
+    return header, pixels
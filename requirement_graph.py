@@ -0,0 +1,165 @@
+"""
+Reachability over the requirement node graph from RequirementNodeData.xml.
+"""
+
+from typing import *
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Yields the indices of set bits, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+Closure = tuple[int, int]
+"""(offset, bits): the set of target bits `bits << offset`, kept shifted down so it is only as wide as its span"""
+EMPTY: Closure = (0, 0)
+
+
+def union(a: Closure, b: Closure) -> Closure:
+    if not b[1]:
+        return a
+    if not a[1]:
+        return b
+    offset = min(a[0], b[0])
+    return offset, (a[1] << (a[0] - offset)) | (b[1] << (b[0] - offset))
+
+
+class RequirementGraph:
+    """
+    Requirement nodes interned to integer IDs, with the set of nodes reachable from each node precomputed as a bitset.
+    Given `targets`, bitsets only hold the target nodes; otherwise every node is a target.
+    Given `starts`, only the closures of those nodes are kept; the others are dropped as soon as every predecessor
+    has used them, so memory follows the frontier of the walk rather than the whole graph.
+
+    Strongly connected components are collapsed with Tarjan's algorithm, which emits them in reverse topological order,
+    so each component's closure is built once from the already-finished closures of its successors.
+    Target bits are numbered in that same order, so the targets below a node sit close together and each closure is
+    stored as a window of bits (see `Closure`) rather than a bitset as wide as the whole graph.
+    Cycles are handled; every node reaches itself.
+    """
+    def __init__(
+        self,
+        edges: Mapping[str, Iterable[str]],
+        nodes: Iterable[str] = (),
+        targets: Iterable[str] | None = None,
+        starts: Iterable[str] | None = None,
+    ) -> None:
+        target_names = None if targets is None else set(targets)
+        start_names = None if starts is None else set(starts)
+        names = set(nodes)
+        names.update(edges)
+        names.update(target_names or ())
+        names.update(start_names or ())
+        for successors in edges.values():
+            names.update(successors)
+        self.names: list[str] = sorted(names)
+        self.ids: dict[str, int] = {name: node_id for node_id, name in enumerate(self.names)}
+        self.successors: list[list[int]] = [[] for _ in self.names]
+        for source, successors in edges.items():
+            self.successors[self.ids[source]] = [self.ids[successor] for successor in successors]
+        is_target = [target_names is None or name in target_names for name in self.names]
+        kept = None if start_names is None else [name in start_names for name in self.names]
+        self.targets: list[str] = []
+        """Target names by bit"""
+        self.closures: list[Closure | None] = self._compute_closures(is_target, kept)
+        self.target_bits: dict[str, int] = {name: bit for bit, name in enumerate(self.targets)}
+
+    def _compute_closures(self, is_target: list[bool], kept: list[bool] | None) -> list[Closure | None]:
+        """Closures of every node, or with `kept`, of the kept nodes only; the others are None"""
+        num_nodes = len(self.names)
+        index = [-1] * num_nodes
+        lowlink = [0] * num_nodes
+        on_stack = [False] * num_nodes
+        stack: list[int] = []
+        closures: list[Closure | None] = [None] * num_nodes
+        # Predecessors that have not used a node's closure yet
+        remaining = [0] * num_nodes
+        for successors in self.successors:
+            for successor in successors:
+                remaining[successor] += 1
+        next_index = 0
+        for root in range(num_nodes):
+            if index[root] >= 0:
+                continue
+            # Iterative Tarjan; each frame is (node, position in its successor list)
+            frames = [(root, 0)]
+            index[root] = lowlink[root] = next_index
+            next_index += 1
+            stack.append(root)
+            on_stack[root] = True
+            while frames:
+                node, position = frames[-1]
+                successors = self.successors[node]
+                if position < len(successors):
+                    frames[-1] = (node, position + 1)
+                    successor = successors[position]
+                    if index[successor] < 0:
+                        index[successor] = lowlink[successor] = next_index
+                        next_index += 1
+                        stack.append(successor)
+                        on_stack[successor] = True
+                        frames.append((successor, 0))
+                    elif on_stack[successor]:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                    continue
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] != index[node]:
+                    continue
+                # node is the root of a component; all successors outside it are already finished
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                own_targets = [self.names[member] for member in members if is_target[member]]
+                closure = (len(self.targets), (1 << len(own_targets)) - 1) if own_targets else EMPTY
+                self.targets.extend(own_targets)
+                for member in members:
+                    for successor in self.successors[member]:
+                        if closures[successor] is not None:
+                            closure = union(closure, closures[successor])
+                        remaining[successor] -= 1
+                        if kept is not None and not remaining[successor] and not kept[successor]:
+                            closures[successor] = None
+                for member in members:
+                    if kept is None or remaining[member] or kept[member]:
+                        closures[member] = closure
+        return closures
+
+    def bitset(self, names: Iterable[str]) -> int:
+        bits = 0
+        for name in names:
+            bits |= 1 << self.target_bits[name]
+        return bits
+
+    def closure(self, start: str) -> Closure:
+        closure = self.closures[self.ids[start]]
+        assert closure is not None, f'{start} is not a start node'
+        return closure
+
+    def reachable(self, starts: Iterable[str]) -> int:
+        """Bitset of all targets reachable from any of `starts`, including themselves"""
+        bits = 0
+        for start in starts:
+            offset, closure_bits = self.closure(start)
+            bits |= closure_bits << offset
+        return bits
+
+    def names_of(self, bits: int) -> list[str]:
+        return sorted(self.targets[bit] for bit in iter_bits(bits))
+
+    def reachable_names(self, starts: Iterable[str]) -> list[str]:
+        """Sorted names of all targets reachable from any of `starts`, without building a bitset over every target"""
+        result = set()
+        for start in starts:
+            offset, closure_bits = self.closure(start)
+            result.update(self.targets[offset + bit] for bit in iter_bits(closure_bits))
+        return sorted(result)
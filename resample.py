@@ -0,0 +1,117 @@
+"""
+Resizes RGBA images with a Mitchell-Netravali filter, the filter magick's `-resize` uses for images with alpha.
+
+Colours are weighted by alpha while resampling, as magick does, so transparent pixels don't bleed into their
+neighbours. With numpy installed, each pass is a matrix product; otherwise it runs in pure python.
+Both give the same pixels.
+"""
+
+from typing import *
+import functools
+
+from png_codec import RGBAImage
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is optional, only used to speed up resizing
+    np = None
+
+FILTER_SUPPORT = 2.0
+
+
+def mitchell(x: float) -> float:
+    """Mitchell-Netravali cubic with B = C = 1/3"""
+    b = c = 1 / 3
+    x = abs(x)
+    if x < 1:
+        return ((12 - 9 * b - 6 * c) * x ** 3 + (-18 + 12 * b + 6 * c) * x ** 2 + (6 - 2 * b)) / 6
+    if x < 2:
+        return ((-b - 6 * c) * x ** 3 + (6 * b + 30 * c) * x ** 2 + (-12 * b - 48 * c) * x + (8 * b + 24 * c)) / 6
+    return 0.0
+
+
+@functools.lru_cache(maxsize=None)
+def contributions(source_size: int, target_size: int) -> list[list[tuple[int, float]]]:
+    """For each target pixel, the (source index, normalised weight) pairs it is made of"""
+    factor = target_size / source_size
+    # When shrinking, the filter is stretched so every source pixel contributes
+    scale = min(factor, 1.0)
+    support = FILTER_SUPPORT / scale
+    result = []
+    for target in range(target_size):
+        centre = (target + 0.5) / factor
+        start = max(int(centre - support + 0.5), 0)
+        stop = min(int(centre + support + 0.5), source_size)
+        weights = [(source, mitchell((source + 0.5 - centre) * scale)) for source in range(start, stop)]
+        total = sum(weight for _, weight in weights)
+        result.append([(source, weight / total) for source, weight in weights])
+    return result
+
+
+def weight_matrix(source_size: int, target_size: int) -> 'np.ndarray':
+    matrix = np.zeros((target_size, source_size), dtype=np.float64)
+    for target, weights in enumerate(contributions(source_size, target_size)):
+        for source, weight in weights:
+            matrix[target, source] = weight
+    return matrix
+
+
+def to_bytes(values: Iterable[float]) -> bytes:
+    return bytes(min(max(int(value + 0.5), 0), 255) for value in values)
+
+
+def resize_array(pixels: 'np.ndarray', width: int, height: int) -> 'np.ndarray':
+    """Resizes a (height, width, 4) uint8 array"""
+    source_height, source_width, _ = pixels.shape
+    values = pixels.astype(np.float64)
+    values[..., :3] *= values[..., 3:] / 255
+    rows = weight_matrix(source_height, height)
+    columns = weight_matrix(source_width, width)
+    values = np.einsum('ys,sxc->yxc', rows, values)
+    values = np.einsum('xs,ysc->yxc', columns, values)
+    alpha = values[..., 3:]
+    values[..., :3] = np.divide(values[..., :3] * 255, alpha, out=np.zeros_like(values[..., :3]), where=alpha > 1e-9)
+    return np.clip(np.floor(values + 0.5), 0, 255).astype(np.uint8)
+
+
+def resize(image: RGBAImage, width: int, height: int) -> RGBAImage:
+    if (image.width, image.height) == (width, height):
+        return image
+    if np is not None:
+        pixels = np.frombuffer(image.pixels, dtype=np.uint8).reshape(image.height, image.width, 4)
+        return RGBAImage(width, height, resize_array(pixels, width, height).tobytes())
+
+    # Premultiplied rows of [r, g, b, a, r, g, b, a, ...] floats
+    source = image.pixels
+    premultiplied = []
+    for y in range(image.height):
+        row = []
+        for offset in range(y * image.width * 4, (y + 1) * image.width * 4, 4):
+            alpha = source[offset + 3]
+            row.extend((source[offset] * alpha / 255, source[offset + 1] * alpha / 255, source[offset + 2] * alpha / 255, alpha))
+        premultiplied.append(row)
+
+    tall = []
+    for weights in contributions(image.height, height):
+        row = [0.0] * (image.width * 4)
+        for source_row, weight in weights:
+            for index, value in enumerate(premultiplied[source_row]):
+                row[index] += weight * value
+        tall.append(row)
+
+    result = bytearray()
+    column_weights = contributions(image.width, width)
+    for row in tall:
+        for weights in column_weights:
+            pixel = [0.0] * 4
+            for source_column, weight in weights:
+                for channel in range(4):
+                    pixel[channel] += weight * row[source_column * 4 + channel]
+            alpha = pixel[3]
+            if alpha > 1e-9:
+                pixel[:3] = [value * 255 / alpha for value in pixel[:3]]
+            else:
+                pixel[:3] = [0.0, 0.0, 0.0]
+            result += to_bytes(pixel)
+    return RGBAImage(width, height, bytes(result))
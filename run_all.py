@@ -6,7 +6,10 @@ import sys
 
 import clean_icons
 import convert
-from generate import itemlist, itemgroups, missiongroups
+import dedupe_icons
+import optimize_icons
+import validate_icons
+from generate import itemlist, itemgroups, missiongroups, sprites
 import parse_icon_data
 from filepaths import Paths
 
@@ -14,10 +17,12 @@ if __name__ == '__main__':
     with open('workspace.json', 'r') as fp:
         workspace = json.load(fp)
     FAST = True
+    PARSE_WORKERS = os.cpu_count() or 1
     paths = Paths()
     paths.is_beta = True
     paths.icon_paths = 'data/beta_icon_paths.json'
     paths.icon_manifest = 'data/beta_icon_manifest.json'
+    paths.icon_aliases = 'data/beta_icon_aliases.json'
     paths.item_data = 'data/beta_item_data.json'
     paths.items_html = 'betaitems.html'
 
@@ -41,9 +46,16 @@ if __name__ == '__main__':
         return_code = subprocess.call([python_binary, '-m', 'scripts.clean', 'r'], env=env, cwd=workspace['ap_files'])
         assert not return_code
 
-    parse_icon_data.main(paths)
+    parse_icon_data.main(paths, workers=PARSE_WORKERS)
     if not FAST: clean_icons.main()
     convert.main(paths, fast=FAST)
+    # Only prune on clean builds; duplicates the stable manifest still uses are kept
+    dedupe_icons.main(paths, prune=not FAST)
+    optimize_icons.main(paths)
+    validate_icons.main(paths)
+    if paths.use_sprites:
+        # The sprites come from the atlas metadata, so run generate_atlas.py first
+        sprites.main(paths)
     itemlist.main(paths)
     missiongroups.main(paths)
     itemgroups.main(paths)
@@ -0,0 +1,171 @@
+"""
+Benchmark each parse_icon_data parser and the item resolvers on synthetic mod checkouts at several scales,
+comparing against a stored baseline. Every resolver's output is checked against `resolve_item_icon`.
+Exits nonzero on a regression or a mismatch. Run from the repo root with
+`python -m scripts.benchmark_parse [scale ...] [--no-memory] [--save-baseline]`
+"""
+
+from typing import *
+import json
+import os
+import time
+import tracemalloc
+
+from filepaths import Paths
+from override_matcher import OverrideMatcher
+from parse_icon_data import get_parse_jobs, combine_parse_results, get_item_numbers, resolve_item_icon
+from batch_resolve import BatchResolver, build_resolution_graph
+from scripts.synthetic_gamedata import generate
+
+DEFAULT_SCALES = (1, 10, 100)
+FIXTURE_DIR = 'build/benchmark'
+BASELINE_PATH = 'scripts/benchmark_baseline.json'
+REGRESSION_THRESHOLD = 1.5
+"""A measurement this many times slower than its baseline is reported as a regression"""
+MIN_REGRESSION_SECONDS = 0.005
+"""Slowdowns smaller than this are timer noise and never reported"""
+MIN_TIMED_SECONDS = 1.0
+MAX_REPEATS = 5
+
+
+class Measurement(NamedTuple):
+    seconds: float
+    peak_bytes: int | None
+    count: int
+    unit: str
+
+    def throughput(self) -> str:
+        return f'{self.count / self.seconds:12,.0f} {self.unit}/s' if self.seconds else ''
+
+
+def measure(function: Callable, *args: Any, memory: bool = True) -> tuple[Any, float, int | None]:
+    """
+    Returns the result, the best wall time and, if `memory`, the peak traced allocation of an extra call.
+    Fast functions are repeated until MIN_TIMED_SECONDS have passed, up to MAX_REPEATS times.
+    """
+    seconds = float('inf')
+    total = 0.0
+    for _ in range(MAX_REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        seconds = min(seconds, elapsed)
+        total += elapsed
+        if total >= MIN_TIMED_SECONDS:
+            break
+    if not memory:
+        return result, seconds, None
+    # Tracing slows python down a lot, so memory is measured on its own run
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def count_lines(paths: Iterable[str]) -> int:
+    total = 0
+    for path in paths:
+        with open(path, 'rb') as fp:
+            total += sum(1 for _ in fp)
+    return total
+
+
+def get_fixture(scale: int) -> str:
+    fixture_dir = os.path.join(FIXTURE_DIR, f'{scale}x')
+    if not os.path.isfile(os.path.join(fixture_dir, 'workspace.json')):
+        print(f'Generating {scale}x fixture in {fixture_dir}')
+        generate(fixture_dir, scale)
+    return fixture_dir
+
+
+def benchmark(scale: int, memory: bool = True) -> tuple[dict[str, Measurement], list[str]]:
+    """Returns the measurements and the names of resolvers whose output differs from `resolve_item_icon`"""
+    fixture_dir = get_fixture(scale)
+    results: dict[str, Measurement] = {}
+    parsed = {}
+    for name, job in get_parse_jobs({'mod_files': fixture_dir}).items():
+        parsed[name], seconds, peak = measure(job.parser, *job.source_paths, memory=memory)
+        results[name] = Measurement(seconds, peak, count_lines(job.source_paths), 'lines')
+
+    with open(os.path.join(fixture_dir, 'item_data.json'), 'r') as fp:
+        item_numbers = get_item_numbers(json.load(fp))
+    overrides = OverrideMatcher.from_file(Paths().overrides)
+    kwargs = {'item_numbers': item_numbers, **combine_parse_results(parsed), 'overrides': overrides}
+    # Warm the override cache so both resolvers are timed on resolution alone
+    for item_name in item_numbers:
+        overrides[item_name]
+
+    def resolve_all_reference() -> dict[str, list[str]]:
+        return {item_name: resolve_item_icon(item_name, **kwargs) for item_name in item_numbers}
+
+    graph, seconds, peak = measure(build_resolution_graph, kwargs, memory=memory)
+    results['build_resolution_graph'] = Measurement(seconds, peak, len(item_numbers), 'items')
+
+    def resolve_all_batch() -> dict[str, list[str]]:
+        return BatchResolver(graph, item_numbers, overrides).resolve_all(item_numbers)
+
+    reference = None
+    mismatches = []
+    for name, function in (
+        ('resolve_item_icon', resolve_all_reference),
+        ('BatchResolver', resolve_all_batch),
+    ):
+        locations, seconds, peak = measure(function, memory=memory)
+        results[name] = Measurement(seconds, peak, len(item_numbers), 'items')
+        if reference is None:
+            reference = locations
+        elif locations != reference or list(locations) != list(reference):
+            mismatches.append(f'{scale}x {name}')
+    return results, mismatches
+
+
+def load_baseline() -> dict[str, dict[str, float]]:
+    if not os.path.isfile(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, 'r') as fp:
+        return json.load(fp)
+
+
+def report(scale: int, results: dict[str, Measurement], baseline: dict[str, float]) -> list[str]:
+    """Prints a table of results and returns the names of measurements that regressed"""
+    regressions = []
+    print(f'\n{scale}x')
+    for name, measurement in results.items():
+        peak = f'{measurement.peak_bytes / 2**20:9.1f} MiB' if measurement.peak_bytes is not None else ''
+        comparison = ''
+        if name in baseline:
+            ratio = measurement.seconds / baseline[name]
+            comparison = f'{ratio:6.2f}x baseline'
+            if ratio > REGRESSION_THRESHOLD and measurement.seconds - baseline[name] > MIN_REGRESSION_SECONDS:
+                comparison += '  REGRESSION'
+                regressions.append(f'{scale}x {name}')
+        print(f'  {name:>22}: {measurement.seconds:9.3f}s {measurement.throughput():>22} {peak:>13}  {comparison}')
+    return regressions
+
+
+if __name__ == '__main__':
+    import sys
+    scales = [int(arg) for arg in sys.argv[1:] if not arg.startswith('--')] or DEFAULT_SCALES
+    memory = '--no-memory' not in sys.argv
+    save_baseline = '--save-baseline' in sys.argv
+
+    baseline = load_baseline()
+    regressions = []
+    mismatches = []
+    for scale in scales:
+        results, scale_mismatches = benchmark(scale, memory)
+        regressions.extend(report(scale, results, baseline.get(f'{scale}x', {})))
+        mismatches.extend(scale_mismatches)
+        if save_baseline:
+            baseline[f'{scale}x'] = {name: round(measurement.seconds, 4) for name, measurement in results.items()}
+    if save_baseline:
+        with open(BASELINE_PATH, 'w') as fp:
+            json.dump(baseline, fp, indent=2)
+        print(f'\nSaved baseline to {BASELINE_PATH}')
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) over {REGRESSION_THRESHOLD}x baseline: {", ".join(regressions)}')
+    if mismatches:
+        print(f'\n{len(mismatches)} resolver(s) differ from resolve_item_icon: {", ".join(mismatches)}')
+    if regressions or mismatches:
+        sys.exit(1)
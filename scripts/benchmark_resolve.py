@@ -0,0 +1,51 @@
+"""
+Compare per-item and batch item icon resolution. Exits nonzero if the outputs differ.
+Run from the repo root with `python -m scripts.benchmark_resolve`
+"""
+
+import time
+
+from filepaths import Paths
+from parse_icon_data import load_resolve_inputs, resolve_item_icon
+from batch_resolve import BatchResolver, build_resolution_graph
+
+REPEATS = 5
+
+
+def best_time(function) -> tuple[float, dict[str, list[str]]]:
+    best = float('inf')
+    result = {}
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    import sys
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    kwargs = load_resolve_inputs(Paths(), workers)
+    item_numbers = kwargs['item_numbers']
+    overrides = kwargs['overrides']
+    graph = build_resolution_graph(kwargs)
+    # Warm the override cache so every method is timed on resolution alone
+    for item_name in item_numbers:
+        overrides[item_name]
+
+    methods = {
+        'resolve_item_icon': lambda: {name: resolve_item_icon(name, **kwargs) for name in item_numbers},
+        'BatchResolver': lambda: BatchResolver(graph, item_numbers, overrides).resolve_all(item_numbers),
+    }
+    reference = None
+    different = []
+    for method_name, method in methods.items():
+        seconds, locations = best_time(method)
+        if reference is None:
+            reference = locations
+        same = locations == reference and list(locations) == list(reference)
+        if not same:
+            different.append(method_name)
+        print(f'{method_name:>18}: {seconds * 1000:8.2f} ms for {len(locations)} items ({"same" if same else "DIFFERENT"} output)')
+    if different:
+        sys.exit(1)
@@ -0,0 +1,287 @@
+"""
+Generate a synthetic mod checkout for benchmarking parse_icon_data: GameData xml, a matching trigger library,
+item data and a workspace.json pointing at it. Scale 1 is roughly the size of the current mod (~860 items).
+"""
+
+from typing import *
+import json
+import os
+
+
+RACES = ('Terran', 'Zerg', 'Protoss')
+BASE_UNITS = 90
+BASE_UPGRADES = 170
+BASE_PROGRESSIVE = 10
+BASE_ABILITIES = 50
+TRAIN_SLOTS = 30
+XML_HEADER = '<?xml version="1.0" encoding="us-ascii"?>\n<Catalog>\n'
+XML_FOOTER = '</Catalog>\n'
+GAME_DATA_DIR = 'Mods/ArchipelagoPlayer.SC2Mod/Base.SC2Data/GameData'
+GALAXY_PATH = 'Mods/ArchipelagoTriggers.SC2Mod/Base.SC2Data/LibABFE498B.galaxy'
+
+
+def generate(out_dir: str, scale: int = 1) -> dict[str, str]:
+    """Writes the fixture to `out_dir` and returns the path of each generated file"""
+    files = {
+        name: [] for name in (
+            'UpgradeData.xml', 'ButtonData.xml', 'UnitData.xml', 'AbilData.xml', 'RequirementData.xml',
+            'RequirementNodeData.xml', 'BehaviorData.xml', 'ValidatorData.xml',
+        )
+    }
+    galaxy: list[str] = ['include "TriggerLibs/natives"\n\n']
+    items: dict[str, dict] = {}
+    for race in RACES:
+        galaxy_categories: dict[str, tuple[str, list[str]]] = {}
+        # units
+        unit_funcs = []
+        num_units = BASE_UNITS * scale
+        for index in range(num_units):
+            unit = f'AP_{race}Unit{index}'
+            stem = f'AP_{race}Train{index // TRAIN_SLOTS}'
+            slot = index % TRAIN_SLOTS
+            if slot == 0:
+                if index:
+                    files['AbilData.xml'].append(f'    </CAbilTrain>\n')
+                files['AbilData.xml'].append(f'    <CAbilTrain id="{stem}">\n')
+            files['AbilData.xml'].extend([
+                f'        <InfoArray index="Train{slot + 1}">\n',
+                f'            <Button DefaultButtonFace="{unit}" State="Restricted" Requirements="AP_{race}UseTrain{index}"/>\n',
+                f'            <Unit value="{unit}"/>\n',
+                f'        </InfoArray>\n',
+            ])
+            files['ButtonData.xml'].extend([
+                f'    <CButton id="{unit}">\n',
+                f'        <Icon value="Assets\\Textures\\btn-unit-{race.lower()}-{index}.dds"/>\n',
+                f'        <Tooltip value="Button/Tooltip/{unit}"/>\n',
+                f'    </CButton>\n',
+            ])
+            files['UnitData.xml'].extend([
+                f'    <CUnit id="AP_{race}Producer{index // TRAIN_SLOTS}">\n' if slot == 0 else '',
+                f'        <CardLayouts>\n' if slot == 0 else '',
+                f'            <LayoutButtons Face="{unit}" Type="AbilCmd" AbilCmd="{stem},Train{slot + 1}" Row="{slot // 5}" Column="{slot % 5}"/>\n',
+                f'        </CardLayouts>\n' if slot == TRAIN_SLOTS - 1 or index == num_units - 1 else '',
+                f'    </CUnit>\n' if slot == TRAIN_SLOTS - 1 or index == num_units - 1 else '',
+            ])
+            function = f'libABFE498B_gf_AP_Triggers_unlock{race}{index}Unit'
+            unit_funcs.append(function)
+            galaxy.extend([
+                f'void {function} (int lp_player) {{\n',
+                f'    // Automatic Variable Declarations\n',
+                f'    // Implementation\n',
+                f'    TechTreeUnitAllow(lp_player, "{unit}", true);\n',
+                f'    TechTreeUnitAllow(lp_player, "AP_{race}Shared", true);\n',
+                f'}}\n\n',
+            ])
+            items[f'{race} Unit {index}'] = make_item(race, 'Unit', index)
+        files['AbilData.xml'].append(f'    </CAbilTrain>\n')
+        galaxy_categories['Units'] = ('processBitsInBitArray', unit_funcs)
+        galaxy.append(f'void libABFE498B_gf_AP_Triggers_unlock{race}Shared (int lp_player) {{\n')
+        galaxy.append(f'    TechTreeUnitAllow(lp_player, "AP_{race}Shared", true);\n}}\n\n')
+
+        # upgrades
+        upgrade_funcs = []
+        for index in range(BASE_UPGRADES * scale):
+            upgrade = f'AP_{race}Upgrade{index}'
+            kind = index % 4
+            files['UpgradeData.xml'].append(f'    <CUpgrade id="{upgrade}">\n')
+            if kind == 0:
+                files['UpgradeData.xml'].append(f'        <Icon value="Assets\\Textures\\btn-upgrade-{race.lower()}-{index}.dds"/>\n')
+            files['UpgradeData.xml'].extend([
+                f'        <Race value="{race[:4]}"/>\n',
+                f'        <EffectArray Reference="Weapon,AP_{race}Weapon{index},Level" Value="1"/>\n',
+                f'    </CUpgrade>\n',
+            ])
+            node = f'AP_{race}Upgrade{index}Count'
+            files['RequirementNodeData.xml'].extend([
+                f'    <CRequirementCountUpgrade id="{node}">\n',
+                f'        <Count Link="{upgrade}" State="CompleteOnly"/>\n',
+                f'    </CRequirementCountUpgrade>\n',
+                f'    <CRequirementAnd id="{node}And">\n',
+                f'        <OperandArray value="{node}"/>\n',
+                f'        <OperandArray index="1" value="AP_{race}Diamond{index % 7}"/>\n',
+                f'    </CRequirementAnd>\n',
+            ])
+            requirement = f'AP_{race}Have{index}'
+            files['RequirementData.xml'].extend([
+                f'    <CRequirement id="{requirement}">\n',
+                f'        <NodeArray index="Use" Link="{node}And"/>\n',
+                f'        <NodeArray index="Show" Link="{node}And"/>\n',
+                f'    </CRequirement>\n',
+            ])
+            button = f'AP_{race}UpgradeButton{index}'
+            files['ButtonData.xml'].extend([
+                f'    <CButton id="{button}">\n',
+                f'        <Icon value="Assets\\Textures\\btn-ability-{race.lower()}-{index}.dds"/>\n',
+                f'    </CButton>\n',
+            ])
+            if kind == 1:
+                ability = f'AP_{race}Ability{index}'
+                files['AbilData.xml'].extend([
+                    f'    <CAbilEffectInstant id="{ability}">\n',
+                    f'        <CmdButtonArray index="Execute" DefaultButtonFace="{button}" Requirements="{requirement}"/>\n',
+                    f'    </CAbilEffectInstant>\n',
+                ])
+                files['UnitData.xml'].extend([
+                    f'    <CUnit id="AP_{race}Caster{index}">\n',
+                    f'        <CardLayouts>\n',
+                    f'            <LayoutButtons Face="{button}" Type="AbilCmd" AbilCmd="{ability},Execute" Row="0" Column="0"/>\n',
+                    f'            <LayoutButtons>\n',
+                    f'                <Face value="{button}"/>\n',
+                    f'                <AbilCmd value="{ability},0"/>\n',
+                    f'            </LayoutButtons>\n',
+                    f'        </CardLayouts>\n',
+                    f'    </CUnit>\n',
+                ])
+            elif kind == 2:
+                files['UnitData.xml'].extend([
+                    f'    <CUnit id="AP_{race}Passive{index}">\n',
+                    f'        <CardLayouts>\n',
+                    f'            <LayoutButtons Face="{button}" Type="Passive" Row="1" Column="0" Requirements="{requirement}"/>\n',
+                    f'            <LayoutButtons>\n',
+                    f'                <Face value="{button}"/>\n',
+                    f'                <Requirements value="{requirement}"/>\n',
+                    f'            </LayoutButtons>\n',
+                    f'        </CardLayouts>\n',
+                    f'    </CUnit>\n',
+                ])
+            elif kind == 3:
+                validator = f'AP_{race}Validator{index}'
+                files['ValidatorData.xml'].extend([
+                    f'    <CValidatorPlayerRequirement id="{validator}">\n',
+                    f'        <Value value="{requirement}"/>\n',
+                    f'        <Find value="1"/>\n',
+                    f'    </CValidatorPlayerRequirement>\n',
+                ])
+                files['BehaviorData.xml'].extend([
+                    f'    <CBehaviorBuff id="AP_{race}Buff{index}">\n',
+                    f'        <InfoIcon value="Assets\\Textures\\btn-buff-{race.lower()}-{index}.dds"/>\n',
+                    f'        <DisableValidatorArray value="{validator}"/>\n',
+                    f'    </CBehaviorBuff>\n',
+                ])
+            function = f'libABFE498B_gf_AP_Triggers_unlock{race}{index}Upgrade'
+            upgrade_funcs.append(function)
+            galaxy.extend([
+                f'void {function} (int lp_player) {{\n',
+                f'    libNtve_gf_SetUpgradeLevelForPlayer(lp_player, "{upgrade}", 1);\n',
+                f'}}\n\n',
+            ])
+            items[f'{race} Upgrade {index}'] = make_item(race, 'Upgrade', index)
+        for index in range(7):
+            node = f'AP_{race}Diamond{index}'
+            files['RequirementNodeData.xml'].extend([
+                f'    <CRequirementOr id="{node}">\n',
+                f'        <OperandArray value="AP_{race}Diamond{index + 1}"/>\n' if index < 6 else '',
+                f'        <OperandArray index="1" value="AP_{race}DiamondLeaf"/>\n',
+                f'    </CRequirementOr>\n',
+            ])
+        files['RequirementNodeData.xml'].extend([
+            f'    <CRequirementCountUnit id="AP_{race}DiamondLeaf">\n',
+            f'        <Count Link="AP_{race}Unit0" State="CompleteOnly"/>\n',
+            f'    </CRequirementCountUnit>\n',
+        ])
+        galaxy_categories['Upgrades'] = ('processBitsInBitArray', upgrade_funcs)
+
+        # progressive upgrades
+        progressive_funcs = []
+        for index in range(BASE_PROGRESSIVE * scale):
+            upgrade = f'AP_{race}Progressive{index}'
+            files['UpgradeData.xml'].extend([
+                f'    <CUpgrade id="{upgrade}">\n',
+                f'        <Icon value="Assets\\Textures\\btn-progressive-{race.lower()}-{index}.dds"/>\n',
+                f'    </CUpgrade>\n',
+            ])
+            function = f'libABFE498B_gf_AP_Triggers_unlock{race}{index}Progressive'
+            progressive_funcs.append(function)
+            galaxy.extend([
+                f'void {function} (int lp_player, int lp_level) {{\n',
+                f'    libNtve_gf_SetUpgradeLevelForPlayer(lp_player, "{upgrade}", lp_level);\n',
+                f'}}\n\n',
+            ])
+            items[f'{race} Progressive {index}'] = make_item(race, 'Progressive', index * 2)
+        galaxy_categories['ProgressiveUpgrades'] = ('ap_triggers_processUpgrades', progressive_funcs)
+
+        # abilities
+        if race == 'Zerg':
+            ability_funcs = []
+            for index in range(BASE_ABILITIES * scale):
+                ability = f'AP_KerriganAbility{index // 10}'
+                files['UnitData.xml'].extend([
+                    f'    <CUnit id="AP_KerriganCard{index}">\n',
+                    f'        <CardLayouts>\n',
+                    f'            <LayoutButtons Face="AP_KerriganButton{index}" Type="AbilCmd" AbilCmd="{ability},{index % 10}" Row="2" Column="0"/>\n',
+                    f'        </CardLayouts>\n',
+                    f'    </CUnit>\n',
+                ])
+                files['ButtonData.xml'].extend([
+                    f'    <CButton id="AP_KerriganButton{index}">\n',
+                    f'        <Icon value="Assets\\Textures\\btn-ability-kerrigan-{index}.dds"/>\n',
+                    f'    </CButton>\n',
+                ])
+                function = f'libABFE498B_gf_AP_Triggers_unlockKerrigan{index}'
+                ability_funcs.append(function)
+                galaxy.extend([
+                    f'void {function} (int lp_player) {{\n',
+                    f'    TechTreeAbilityAllow(lp_player, AbilityCommand("{ability}", {index % 10}), true);\n',
+                    f'}}\n\n',
+                ])
+                items[f'Kerrigan Ability {index}'] = make_item(race, 'Ability', index)
+            galaxy_categories['KerriganAbilities'] = ('processBitsInBitArray', ability_funcs)
+
+        for category, (processor, functions) in galaxy_categories.items():
+            galaxy.extend([
+                f'void libABFE498B_gf_AP_Triggers_unlock{race}{category} (int lp_player, int lp_bitArrayValue) {{\n',
+                f'    // Implementation\n',
+                f'    libABFE498B_gf_{processor}(\n',
+                f'        lp_player,\n',
+                f'        lp_bitArrayValue,\n',
+            ])
+            galaxy.extend(f'        {function},\n' for function in functions)
+            galaxy.extend([
+                f'        libABFE498B_gf_Consumer_sig\n',
+                f'    );\n',
+                f'}}\n\n',
+            ])
+        galaxy.extend([
+            f'void libABFE498B_gf_AP_Triggers_{race}DefaultTech (int lp_player) {{\n',
+            f'    TechTreeUnitAllow(lp_player, "AP_{race}Unit0", true);\n',
+            f'}}\n\n',
+        ])
+
+    game_data = os.path.join(out_dir, GAME_DATA_DIR)
+    os.makedirs(game_data, exist_ok=True)
+    result = {}
+    for filename, lines in files.items():
+        path = os.path.join(game_data, filename)
+        with open(path, 'w') as fp:
+            fp.write(XML_HEADER)
+            fp.writelines(lines)
+            fp.write(XML_FOOTER)
+        result[filename] = path
+    result['galaxy'] = os.path.join(out_dir, GALAXY_PATH)
+    os.makedirs(os.path.dirname(result['galaxy']), exist_ok=True)
+    with open(result['galaxy'], 'w') as fp:
+        fp.writelines(galaxy)
+    result['item_data'] = os.path.join(out_dir, 'item_data.json')
+    with open(result['item_data'], 'w') as fp:
+        json.dump(items, fp, indent=2)
+    result['workspace'] = os.path.join(out_dir, 'workspace.json')
+    with open(result['workspace'], 'w') as fp:
+        json.dump({'mod_files': os.path.abspath(out_dir)}, fp, indent=2)
+    return result
+
+
+def make_item(race: str, item_type: str, number: int) -> dict:
+    return {
+        'type': item_type,
+        'number': number,
+        'race': race.upper(),
+        'classification': 'progression',
+        'quantity': 1,
+        'parent': None,
+        'description': '',
+    }
+
+
+if __name__ == '__main__':
+    import sys
+    print(generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1))
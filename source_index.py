@@ -0,0 +1,115 @@
+"""
+Case-insensitive lookup of icon source files.
+
+The game's texture paths don't match the case of the extracted files, so every lookup used to be a
+case-insensitive glob over the whole directory. A SourceIndex scans a directory tree once into a
+lowercase relative path -> real path map and persists it, keyed by the mtime of every directory in the tree.
+"""
+
+from typing import *
+import hashlib
+import os
+import pickle
+
+INDEX_VERSION = 1
+
+
+class IndexState(NamedTuple):
+    version: int
+    root: str
+    directory_mtimes: dict[str, int]
+    """relative directory -> st_mtime_ns"""
+    files: dict[str, list[str]]
+    """lowercase relative path -> real relative paths, sorted; more than one is a case collision"""
+
+
+def scan(root: str) -> IndexState:
+    directory_mtimes: dict[str, int] = {}
+    files: dict[str, list[str]] = {}
+    pending = [''] if os.path.isdir(root) else []
+    while pending:
+        relative_dir = pending.pop()
+        directory = os.path.join(root, relative_dir)
+        directory_mtimes[relative_dir] = os.stat(directory).st_mtime_ns
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                relative_path = f'{relative_dir}/{entry.name}' if relative_dir else entry.name
+                if entry.is_dir():
+                    pending.append(relative_path)
+                else:
+                    files.setdefault(relative_path.lower(), []).append(relative_path)
+    for real_paths in files.values():
+        real_paths.sort()
+    return IndexState(INDEX_VERSION, os.path.abspath(root), directory_mtimes, files)
+
+
+def is_current(state: IndexState, root: str) -> bool:
+    """Whether no directory in the tree has changed; adding or removing an entry changes its parent's mtime"""
+    if state.version != INDEX_VERSION or state.root != os.path.abspath(root) or not state.directory_mtimes:
+        return False
+    for relative_dir, mtime in state.directory_mtimes.items():
+        try:
+            if os.stat(os.path.join(root, relative_dir)).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class SourceIndex:
+    """
+    Every file under `root` by lowercase relative path (`/`-separated). Loaded from `cache_dir` when no directory
+    has changed since the index was saved, otherwise rescanned and saved again.
+    """
+    def __init__(self, root: str, cache_dir: str | None = None) -> None:
+        self.root = root
+        self.rescanned = False
+        cache_path = None
+        if cache_dir is not None:
+            root_hash = hashlib.sha256(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+            cache_path = os.path.join(cache_dir, f'source_index.{root_hash}.pickle')
+        state = self.load(cache_path) if cache_path else None
+        if state is None or not is_current(state, root):
+            state = scan(root)
+            self.rescanned = True
+            if cache_path:
+                self.save(cache_path, state)
+        self.state = state
+
+    @staticmethod
+    def load(cache_path: str) -> IndexState | None:
+        try:
+            with open(cache_path, 'rb') as fp:
+                state = pickle.load(fp)
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            print(f'Ignoring unreadable source index {cache_path}: {ex}')
+            return None
+        return state if isinstance(state, IndexState) else None
+
+    @staticmethod
+    def save(cache_path: str, state: IndexState) -> None:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as fp:
+            pickle.dump(state, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+
+    def matches(self, relative_path: str) -> list[str]:
+        """Every real path matching `relative_path` case-insensitively, sorted"""
+        real_paths = self.state.files.get(relative_path.replace('\\', '/').lower(), [])
+        return [os.path.join(self.root, real_path) for real_path in real_paths]
+
+    def lookup(self, relative_path: str) -> str | None:
+        """The real path of `relative_path`, matched case-insensitively, or None"""
+        matches = self.matches(relative_path)
+        return matches[0] if matches else None
+
+    @property
+    def collisions(self) -> dict[str, list[str]]:
+        """Lowercase paths that match more than one file"""
+        return {path: real_paths for path, real_paths in self.state.files.items() if len(real_paths) > 1}
+
+    def __len__(self) -> int:
+        return len(self.state.files)
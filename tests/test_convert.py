@@ -0,0 +1,135 @@
+import json
+import os
+import struct
+
+import convert
+import dedupe_icons
+from dds_reader import DDPF_ALPHAPIXELS, DDPF_RGB, HEADER_SIZE
+from filepaths import Paths
+
+
+def write_dds(path: str, width: int, height: int, pixels: bytes) -> None:
+    """Writes uncompressed 32-bit RGBA pixels as a .dds file"""
+    header = struct.pack('<7I', HEADER_SIZE, 0x100f, height, width, width * 4, 0, 1) + bytes(44)
+    header += struct.pack('<2I4s5I', 32, DDPF_RGB | DDPF_ALPHAPIXELS, bytes(4), 32, 0xff, 0xff00, 0xff0000, 0xff000000)
+    header += bytes(20)
+    with open(path, 'wb') as fp:
+        fp.write(b'DDS ' + header + pixels)
+
+
+def make_workspace(locations: dict[str, list[str]]) -> Paths:
+    """A workspace in the current directory with an item per location"""
+    os.makedirs('data')
+    os.makedirs('dds')
+    with open('workspace.json', 'w') as fp:
+        json.dump({'dds_files': 'dds', 'mod_files': 'mod'}, fp)
+    with open('data/locations.json', 'w') as fp:
+        json.dump({'locations': locations}, fp)
+    return Paths()
+
+
+def read_manifest(paths: Paths) -> dict[str, list[str]]:
+    with open(paths.icon_manifest, 'r') as fp:
+        return json.load(fp)
+
+
+def test_pruned_duplicates_stay_pruned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = make_workspace({'Marine': ['btn-marine.dds'], 'Marine Copy': ['btn-marine-copy.dds']})
+    pixels = bytes(range(64))
+    write_dds('dds/btn-marine.dds', 4, 4, pixels)
+    write_dds('dds/btn-marine-copy.dds', 4, 4, pixels)
+
+    convert.main(paths, workers=1)
+    assert os.path.isfile('icons/blizzard/btn-marine-copy.png')
+    dedupe_icons.main(paths, prune=True)
+    assert not os.path.isfile('icons/blizzard/btn-marine-copy.png')
+
+    convert.main(paths, workers=1)
+    assert not os.path.isfile('icons/blizzard/btn-marine-copy.png')
+    assert read_manifest(paths)['Marine Copy'] == ['icons/blizzard/btn-marine.png']
+    dedupe_icons.main(paths, prune=True)
+    convert.main(paths, fast=False, workers=1)
+    assert not os.path.isfile('icons/blizzard/btn-marine-copy.png')
+
+
+def test_changed_source_of_pruned_duplicate_is_converted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = make_workspace({'Marine': ['btn-marine.dds'], 'Marine Copy': ['btn-marine-copy.dds']})
+    write_dds('dds/btn-marine.dds', 4, 4, bytes(range(64)))
+    write_dds('dds/btn-marine-copy.dds', 4, 4, bytes(range(64)))
+    convert.main(paths, workers=1)
+    dedupe_icons.main(paths, prune=True)
+
+    write_dds('dds/btn-marine-copy.dds', 4, 4, bytes(range(64, 128)))
+    convert.main(paths, workers=1)
+    assert os.path.isfile('icons/blizzard/btn-marine-copy.png')
+    assert read_manifest(paths)['Marine Copy'] == ['icons/blizzard/btn-marine-copy.png']
+
+
+def test_sources_are_recorded_relative_to_their_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = make_workspace({'Marine': ['btn-marine.dds']})
+    with open('workspace.json', 'w') as fp:
+        json.dump({'dds_files': str(tmp_path / 'dds'), 'mod_files': str(tmp_path / 'mod')}, fp)
+    write_dds('dds/btn-marine.dds', 4, 4, bytes(range(64)))
+    convert.main(paths, workers=1)
+    with open(paths.conversion_manifest, 'r') as fp:
+        outputs = json.load(fp)['outputs']
+    assert outputs['icons/blizzard/btn-marine.png']['source'] == 'dds_files/btn-marine.dds'
+
+
+def test_outputs_of_dropped_items_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = make_workspace({'Marine': ['btn-marine.dds'], 'Medic': ['btn-medic.dds']})
+    write_dds('dds/btn-marine.dds', 4, 4, bytes(range(64)))
+    write_dds('dds/btn-medic.dds', 4, 4, bytes(range(64, 128)))
+    convert.main(paths, workers=1)
+    assert os.path.isfile('icons/blizzard/btn-medic.png')
+
+    with open(paths.icon_paths, 'w') as fp:
+        json.dump({'locations': {'Marine': ['btn-marine.dds']}}, fp)
+    convert.main(paths, workers=1)
+    assert not os.path.isfile('icons/blizzard/btn-medic.png')
+    with open(paths.conversion_manifest, 'r') as fp:
+        assert list(json.load(fp)['outputs']) == ['icons/blizzard/btn-marine.png']
+
+
+def test_outputs_other_manifests_use_are_not_evicted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = make_workspace({'Marine': ['btn-marine.dds'], 'Medic': ['btn-medic.dds']})
+    paths.icon_manifest = 'data/beta_icon_manifest.json'
+    write_dds('dds/btn-marine.dds', 4, 4, bytes(range(64)))
+    write_dds('dds/btn-medic.dds', 4, 4, bytes(range(64, 128)))
+    convert.main(paths, workers=1)
+    with open('data/icon_manifest.json', 'w') as fp:
+        json.dump({'Medic': ['icons/blizzard/btn-medic.png']}, fp)
+
+    with open(paths.icon_paths, 'w') as fp:
+        json.dump({'locations': {'Marine': ['btn-marine.dds']}}, fp)
+    convert.main(paths, workers=1)
+    assert os.path.isfile('icons/blizzard/btn-medic.png')
+
+
+def test_malformed_sources_are_reported_without_the_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert, 'MAGICK_CONVERT', 'no-such-magick-binary')
+    write_dds(str(tmp_path / 'good.dds'), 4, 4, bytes(range(64)))
+    with open(tmp_path / 'good.dds', 'rb') as fp:
+        data = fp.read()
+    with open(tmp_path / 'truncated.dds', 'wb') as fp:
+        fp.write(data[:len(data) - 10])
+    conversions = [
+        convert.Conversion(str(tmp_path / 'truncated.dds'), str(tmp_path / 'truncated.png')),
+        convert.Conversion(str(tmp_path / 'good.dds'), str(tmp_path / 'good.png')),
+    ]
+    errors = dict(convert.run_conversions(conversions, workers=1))
+    assert 'truncated image data' in errors[conversions[0]]
+    assert errors[conversions[1]] is None
+    assert not os.path.exists(tmp_path / 'truncated.png')
+
+    def read_dds(path):
+        raise struct.error('unpack requires a buffer of 4 bytes')
+
+    monkeypatch.setattr(convert, 'read_dds', read_dds)
+    errors = dict(convert.run_conversions(conversions, workers=1))
+    assert all('unpack requires a buffer' in error for error in errors.values())
@@ -0,0 +1,32 @@
+import os
+import struct
+import zlib
+
+import optimize_icons
+from png_codec import PNG_SIGNATURE
+
+
+def chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def test_short_chunk_is_reported_and_left_in_place(tmp_path):
+    path = str(tmp_path / 'short.png')
+    data = PNG_SIGNATURE + chunk(b'IHDR', b'\0\0\0\x04\0') + chunk(b'IEND', b'')
+    with open(path, 'wb') as fp:
+        fp.write(data)
+    result = optimize_icons.optimize_icon(path)
+    assert result.error is not None and result.error.startswith('cannot recompress')
+    assert result.before == result.after == len(data)
+    with open(path, 'rb') as fp:
+        assert fp.read() == data
+
+
+def test_missing_file_is_reported_per_file(tmp_path):
+    paths = [str(tmp_path / 'missing.png'), str(tmp_path / 'short.png')]
+    with open(paths[1], 'wb') as fp:
+        fp.write(PNG_SIGNATURE + chunk(b'IHDR', b'\0') + chunk(b'IEND', b''))
+    results = list(optimize_icons.run_optimizations(paths, workers=1))
+    assert [result.path for result in results] == paths
+    assert results[0].error.startswith('cannot read') and not results[0].output_hash
+    assert results[1].error.startswith('cannot recompress')
@@ -0,0 +1,36 @@
+import re
+
+from override_matcher import OverrideMatcher, compile_patterns, uses_group_references
+
+
+def reference_matches(patterns: list[str], string: str) -> list[int]:
+    return [index for index, pattern in enumerate(patterns) if re.match(pattern, string)]
+
+
+def test_uses_group_references():
+    assert uses_group_references(r'(\w+) \1')
+    assert uses_group_references(r'(?P<word>\w+) (?P=word)')
+    assert uses_group_references(r'(a)?(?(1)b|c)')
+    assert not uses_group_references(r'\\1 \d+ \(?P=')
+    assert not uses_group_references(r'Stim.* \(Marine\)')
+
+
+def test_backreference_patterns_match_like_re_match():
+    patterns = [r'(\w+) \(\1\)$', r'Stim', r'(?P<unit>\w+) .*\((?P=unit)\)', r'(\w)(\w)\2\1']
+    match_all = compile_patterns(patterns)
+    for string in ('Marine (Marine)', 'Stim (Marine)', 'Stimpack (Marauder)', 'abba (x)', 'Reaper (Ghost)'):
+        assert match_all(string) == reference_matches(patterns, string), string
+
+
+def test_backreference_override():
+    matcher = OverrideMatcher({
+        'set': {},
+        'add': {},
+        'remove': {},
+        'pattern_add': {r'Progressive (\w+) \(\1\)': ['icon-progressive.dds'], r'.* \(Marine\)': ['icon-marine.dds']},
+        'pattern_remove': {r'(\w+) Upgrade \(\1\)': ['btn-upgrade']},
+    })
+    assert matcher['Progressive Medic (Medic)'].add == frozenset({'icon-progressive.dds'})
+    assert matcher['Progressive Medic (Marine)'].add == frozenset({'icon-marine.dds'})
+    assert matcher['Laser Upgrade (Laser)'].remove == frozenset({'btn-upgrade'})
+    assert matcher['Laser Upgrade (Marine)'].remove == frozenset()
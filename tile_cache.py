@@ -0,0 +1,124 @@
+"""
+Cache of resized atlas tiles.
+
+Each icon's tiles (the full size tile and every mip level) are stored as raw RGBA under `build/cache/atlas_tiles/`,
+keyed by the icon file's hash and the tile sizes. `manifest.json` records the source and last use of every entry.
+After a build, entries whose source changed or disappeared are evicted, and entries the build didn't use are kept
+least recently used first until the cache fits its size limit, so switching between manifests stays cheap.
+"""
+
+from typing import *
+import hashlib
+import json
+import os
+import time
+
+TILE_CACHE_DIR = 'build/cache/atlas_tiles'
+MAX_CACHE_BYTES = 128 * 2**20
+TILE_CACHE_VERSION = 1
+"""Change when tiles are drawn differently, so every cached tile is redrawn"""
+
+
+class CacheEntry(NamedTuple):
+    source: str
+    source_hash: str
+    size: int
+    last_used: float
+
+
+class TileCache:
+    def __init__(self, cache_dir: str = TILE_CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.entries: dict[str, CacheEntry] = {}
+        self.used: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, 'r') as fp:
+                manifest = json.load(fp)
+            if manifest.get('version') == TILE_CACHE_VERSION:
+                self.entries = {key: CacheEntry(**entry) for key, entry in manifest['entries'].items()}
+
+    @staticmethod
+    def key(source_hash: str, tile_sizes: Sequence[int]) -> str:
+        sizes = ','.join(str(tile_size) for tile_size in tile_sizes)
+        return hashlib.sha256(f'{TILE_CACHE_VERSION}\0{sizes}\0{source_hash}'.encode('utf-8')).hexdigest()
+
+    def tile_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.rgba')
+
+    def get(self, key: str, tile_sizes: Sequence[int]) -> list[bytes] | None:
+        """The cached tiles for `key`, one per tile size, or None"""
+        path = self.tile_path(key)
+        expected = sum(tile_size * tile_size * 4 for tile_size in tile_sizes)
+        if key not in self.entries or not os.path.isfile(path) or os.path.getsize(path) != expected:
+            self.misses += 1
+            return None
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        tiles = []
+        offset = 0
+        for tile_size in tile_sizes:
+            tiles.append(data[offset:offset + tile_size * tile_size * 4])
+            offset += tile_size * tile_size * 4
+        self.hits += 1
+        self.used.add(key)
+        self.entries[key] = self.entries[key]._replace(last_used=time.time())
+        return tiles
+
+    def put(self, key: str, source: str, source_hash: str, tiles: Sequence[bytes]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.tile_path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as fp:
+            for tile in tiles:
+                fp.write(tile)
+        os.replace(temp_path, path)
+        self.used.add(key)
+        self.entries[key] = CacheEntry(source, source_hash, sum(len(tile) for tile in tiles), time.time())
+
+    def evict(self, current_hashes: dict[str, str]) -> tuple[int, int]:
+        """
+        Evicts entries whose source no longer exists or no longer has the entry's hash (`current_hashes` maps the
+        sources of this build to their hashes), then unused entries, least recently used first, until the cache fits.
+        Returns the number of entries and bytes evicted.
+        """
+        stale = [
+            key for key, entry in self.entries.items()
+            if key not in self.used and (
+                current_hashes.get(entry.source, entry.source_hash) != entry.source_hash
+                or not os.path.isfile(entry.source)
+            )
+        ]
+        total = sum(entry.size for entry in self.entries.values()) - sum(self.entries[key].size for key in stale)
+        unused = sorted(self.entries.keys() - self.used - set(stale), key=lambda key: self.entries[key].last_used)
+        for key in unused:
+            if total <= self.max_bytes:
+                break
+            stale.append(key)
+            total -= self.entries[key].size
+        evicted_bytes = 0
+        for key in stale:
+            evicted_bytes += self.entries.pop(key).size
+            if os.path.isfile(self.tile_path(key)):
+                os.unlink(self.tile_path(key))
+        # Tiles left behind by an interrupted build aren't in the manifest at all
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.rgba') and entry.name[:-len('.rgba')] not in self.entries:
+                    evicted_bytes += entry.stat().st_size
+                    os.unlink(entry.path)
+        return len(stale), evicted_bytes
+
+    def save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest = {
+            'version': TILE_CACHE_VERSION,
+            'entries': {key: entry._asdict() for key, entry in sorted(self.entries.items())},
+        }
+        temp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as fp:
+            json.dump(manifest, fp, indent=1)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,123 @@
+"""
+Validate icons from their file headers, without decoding them.
+
+Checks every PNG under `icons/`, every entry of the icon manifest and, where they are on this machine, the .dds
+sources recorded in the conversion manifest. PNGs must have a valid IHDR chunk, 8-bit samples and end with IEND;
+icons that aren't 76x76 are reported because the atlas has to resize them. DDS sources must have a header
+`dds_reader` understands and hold the whole top mip level. The report is written as JSON.
+"""
+
+from typing import *
+import concurrent.futures
+import glob
+import json
+import os
+import struct
+
+from conversion_cache import absolute_source, source_roots
+from dds_reader import read_header, DDSFormatError, HEADER_SIZE, DX10_HEADER_SIZE
+from filepaths import Paths
+from generate_atlas import ICON_SIZE
+from png_codec import read_png_header, PNGFormatError, CHANNELS
+
+ERROR = 'error'
+WARNING = 'warning'
+IEND_CHUNK = struct.pack('>I', 0) + b'IEND' + struct.pack('>I', 0xae426082)
+
+
+class Issue(NamedTuple):
+    path: str
+    kind: str
+    """missing, corrupt, unsupported or off-size"""
+    severity: str
+    detail: str
+
+
+def check_png(path: str, expected_size: int | None = ICON_SIZE) -> list[Issue]:
+    if not os.path.isfile(path):
+        return [Issue(path, 'missing', ERROR, 'file does not exist')]
+    try:
+        header = read_png_header(path)
+    except (PNGFormatError, struct.error) as ex:
+        return [Issue(path, 'corrupt', ERROR, str(ex))]
+    with open(path, 'rb') as fp:
+        fp.seek(max(os.path.getsize(path) - len(IEND_CHUNK), 0))
+        if fp.read() != IEND_CHUNK:
+            return [Issue(path, 'corrupt', ERROR, 'file does not end with an IEND chunk; it may be truncated')]
+    if header.bit_depth != 8 or header.colour_type not in CHANNELS or header.interlace:
+        return [Issue(
+            path, 'unsupported', ERROR,
+            f'bit depth {header.bit_depth}, colour type {header.colour_type}, interlace {header.interlace}',
+        )]
+    if expected_size is not None and (header.width, header.height) != (expected_size, expected_size):
+        return [Issue(path, 'off-size', WARNING, f'{header.width}x{header.height}, expected {expected_size}x{expected_size}')]
+    return []
+
+
+def check_dds(path: str) -> list[Issue]:
+    if not os.path.isfile(path):
+        return [Issue(path, 'missing', WARNING, 'source does not exist on this machine')]
+    with open(path, 'rb') as fp:
+        data = fp.read(4 + HEADER_SIZE + DX10_HEADER_SIZE)
+    try:
+        header = read_header(data)
+    except DDSFormatError as ex:
+        return [Issue(path, 'unsupported', ERROR, str(ex))]
+    size = os.path.getsize(path)
+    if size < header.data_offset + header.data_size():
+        return [Issue(path, 'corrupt', ERROR, f'truncated image data: {size - header.data_offset} of {header.data_size()} bytes')]
+    return []
+
+
+def check_file(path: str) -> list[Issue]:
+    return check_dds(path) if path.lower().endswith('.dds') else check_png(path)
+
+
+def check_files(paths: Iterable[str], workers: int = 1) -> list[Issue]:
+    """Checks every file, .dds by extension and the rest as PNG icons. Reading headers is I/O, so threads suffice"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return [issue for issues in executor.map(check_file, paths) for issue in issues]
+
+
+def main(paths: Paths, workers: int | None = None) -> list[Issue]:
+    """Writes the report and returns its issues"""
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) * 4)
+    with open(paths.icon_manifest, 'r') as fp:
+        icon_manifest: dict[str, list[str]] = json.load(fp)
+    manifest_icons = {icon for item_icons in icon_manifest.values() for icon in item_icons}
+    tree_icons = {path.replace('\\', '/') for path in glob.glob('icons/*/*.png')}
+    sources = set()
+    if os.path.isfile(paths.conversion_manifest):
+        roots = {}
+        if os.path.isfile(paths.workspace):
+            with open(paths.workspace, 'r') as fp:
+                roots = source_roots(json.load(fp))
+        with open(paths.conversion_manifest, 'r') as fp:
+            sources = {absolute_source(record['source'], roots) for record in json.load(fp)['outputs'].values()}
+    checked = sorted(manifest_icons | tree_icons) + sorted(sources)
+    issues = check_files(checked, workers)
+
+    report = {
+        'checked': {'icons': len(manifest_icons | tree_icons), 'manifest_entries': len(manifest_icons), 'sources': len(sources)},
+        'errors': sum(issue.severity == ERROR for issue in issues),
+        'warnings': sum(issue.severity == WARNING for issue in issues),
+        'issues': [issue._asdict() for issue in issues],
+    }
+    os.makedirs(os.path.dirname(paths.icon_validation) or '.', exist_ok=True)
+    with open(paths.icon_validation, 'w') as fp:
+        json.dump(report, fp, indent=1)
+    for issue in issues:
+        if issue.severity == ERROR:
+            print(f'{issue.kind}: {issue.path}: {issue.detail}')
+    print(
+        f'Checked {len(checked)} files | Errors: {report["errors"]} | Warnings: {report["warnings"]} | '
+        f'Report: {paths.icon_validation}'
+    )
+    return issues
+
+
+if __name__ == '__main__':
+    import sys
+    issues = main(Paths())
+    sys.exit(1 if any(issue.severity == ERROR for issue in issues) else 0)